@@ -0,0 +1,511 @@
+##BENCHMARK MODULE
+#times every convolution function and signal generator over a sweep of
+#signal lengths, kernel lengths, dtypes and methods.
+#results are written as JSON so runs can be compared against a stored baseline.
+#
+#usage (from src/):
+#   python benchmark.py --out bench.json
+#   python benchmark.py --quick --baseline bench.json
+#   python benchmark.py --imports        # cold-start import budget only
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from convolution import (
+    conv_dt_manual, conv_dt_numpy, conv_ct_manual, conv_dt_batch, conv_ct_batch,
+    CONV_METHODS, Filter, StreamingConvolver
+)
+
+import signal_generator
+
+
+# ============================================================
+# SWEEP SETTINGS
+# ============================================================
+SIGNAL_LENGTHS = [1_000, 10_000, 100_000]
+KERNEL_LENGTHS = [16, 256, 4_096]
+DTYPES = ["float64", "float32"]
+
+QUICK_SIGNAL_LENGTHS = [1_000, 10_000]
+QUICK_KERNEL_LENGTHS = [16, 256]
+
+# the nested-loop reference visits N * (N + M - 1) (k, n) pairs,
+# it is only run while that stays below this
+SLOW_MAX_WORK = 2_000_000
+
+# the structure hints are benchmarked on matching kernels only (bench_structured)
+DENSE_METHODS = [m for m in CONV_METHODS if m not in ("sparse", "boxcar")]
+STRUCTURED_KERNELS = {"impulse": "sparse", "boxcar": "boxcar"}
+
+# bench_filter applies one kernel to this many different inputs
+FILTER_INPUTS = 16
+
+# bench_batch_stream: channels of the batch functions, samples per stream chunk
+BATCH_CHANNELS = 8
+STREAM_CHUNK = 1024
+
+GENERATORS_CT = ["unit_step_ct", "ramp_ct", "sin_ct", "exp_decay_ct", "impulse_like_ct"]
+GENERATORS_DT = ["unit_step_dt", "ramp_dt", "sin_dt", "exp_decay_dt", "impulse_dt"]
+
+# a case is a regression when it is this much slower than the baseline,
+# and by at least TIME_FLOOR_S (sub-millisecond cases jitter by more than 25%)
+DEFAULT_TOLERANCE = 0.25
+TIME_FLOOR_S = 5e-4
+
+# timing repeats per case (best is kept); every repeat calls the function
+# as often as it takes to run for at least MIN_REPEAT_S and keeps the mean
+DEFAULT_REPEAT = 5
+MIN_REPEAT_S = 0.02
+
+# cold-start check: every module must import without matplotlib, in at most
+# this many seconds on top of `import numpy` (fresh interpreter per run)
+IMPORT_MODULES = [
+    "convolution", "signal_generator", "signal_operations", "signal_expr",
+    "recursive_filter", "signal_storage", "spectral", "parameters", "plot_utils",
+]
+IMPORT_BUDGET_S = 0.1
+
+
+# ============================================================
+# MEASUREMENT HELPERS
+# ============================================================
+def time_call(func, repeat):
+    """
+    Best wall time (seconds) of one func() call over repeat runs.
+
+    A run loops func() until MIN_REPEAT_S has passed (the loop count is
+    taken from the first call), so microsecond cases are not timed from a
+    single call.
+    """
+    start = time.perf_counter()
+    func()
+    first = time.perf_counter() - start
+    loops = max(1, int(MIN_REPEAT_S / first)) if first > 0 else 1000
+
+    best = first
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        best = min(best, (time.perf_counter() - start) / loops)
+    return best
+
+
+def peak_memory(func):
+    """
+    Peak bytes allocated (as seen by tracemalloc) during one call of func().
+    """
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def accuracy(y, y_ref):
+    """
+    Max absolute and max relative error of y against a float64 reference.
+    """
+    y = np.asarray(y, dtype=np.float64)
+    y_ref = np.asarray(y_ref, dtype=np.float64)
+    max_abs = float(np.max(np.abs(y - y_ref)))
+    scale = float(np.max(np.abs(y_ref)))
+    max_rel = max_abs / scale if scale > 0 else max_abs
+    return max_abs, max_rel
+
+
+def measure(func, samples, repeat):
+    """
+    Time + memory + output of a single benchmark case.
+    """
+    seconds = time_call(func, repeat)
+    peak = peak_memory(func)
+    return {
+        "seconds": seconds,
+        "samples_per_s": samples / seconds if seconds > 0 else float("inf"),
+        "peak_bytes": peak,
+    }
+
+
+# ============================================================
+# BENCHMARK CASES
+# ============================================================
+def bench_convolution(signal_lengths, kernel_lengths, dtypes, repeat, rng):
+    """
+    Sweep conv_dt_manual, conv_dt_numpy and conv_ct_manual.
+    """
+    results = []
+
+    for N in signal_lengths:
+        for M in kernel_lengths:
+            x64 = rng.standard_normal(N)
+            h64 = rng.standard_normal(M)
+            y_ref = np.convolve(x64, h64)
+
+            t = np.linspace(-1, 1, N)
+            dt = t[1] - t[0]
+
+            for dtype in dtypes:
+                x = x64.astype(dtype)
+                h = h64.astype(dtype)
+
+                cases = [("conv_dt_manual", "vectorized", lambda: conv_dt_manual(x, h), 1.0)]
+                if N * (N + M - 1) <= SLOW_MAX_WORK:
+                    cases.append(("conv_dt_manual", "slow", lambda: conv_dt_manual(x, h, method="slow"), 1.0))
+
+                for method in DENSE_METHODS:
+                    cases.append((
+                        "conv_dt_numpy", method,
+                        lambda method=method: conv_dt_numpy(x, h, method=method), 1.0
+                    ))
+                    cases.append((
+                        "conv_ct_manual", method,
+                        lambda method=method: conv_ct_manual(t, x, h, method=method)[1], dt
+                    ))
+
+                for name, method, func, scale in cases:
+                    row = {"function": name, "method": method, "n": N, "m": M, "dtype": dtype}
+                    row.update(measure(func, N, repeat))
+                    row["max_abs_error"], row["max_rel_error"] = accuracy(func(), y_ref * scale)
+                    results.append(row)
+
+    return results
+
+
+def bench_structured(signal_lengths, kernel_lengths, repeat, rng):
+    """
+    Impulse (one nonzero) and boxcar (constant run) kernels, the shapes
+    impulse_dt / impulse_like_ct produce, through "auto", the matching
+    structure hint and the dense methods it replaces.
+    """
+    results = []
+
+    for N in signal_lengths:
+        x = rng.standard_normal(N)
+        for M in kernel_lengths:
+            for kernel, hint in STRUCTURED_KERNELS.items():
+                h = np.zeros(M)
+                if kernel == "impulse":
+                    h[M // 2] = 1.0
+                else:
+                    h[M // 4:M // 4 + max(M // 2, 2)] = 1.0 / max(M // 2, 2)
+                y_ref = np.convolve(x, h)
+
+                for method in ("auto", hint, "direct", "fft"):
+                    func = lambda method=method: conv_dt_numpy(x, h, method=method)
+                    row = {"function": f"conv_{kernel}", "method": method, "n": N, "m": M, "dtype": "float64"}
+                    row.update(measure(func, N, repeat))
+                    row["max_abs_error"], row["max_rel_error"] = accuracy(func(), y_ref)
+                    results.append(row)
+
+    return results
+
+
+def bench_filter(signal_lengths, kernel_lengths, repeat, rng):
+    """
+    One kernel applied to FILTER_INPUTS different inputs: conv_dt_numpy per
+    input against a Filter built once (its build time is included).
+    """
+    results = []
+
+    for N in signal_lengths:
+        xs = rng.standard_normal((FILTER_INPUTS, N))
+        for M in kernel_lengths:
+            h = rng.standard_normal(M)
+            y_ref = np.stack([np.convolve(x, h) for x in xs])
+
+            def filter_each(h=h):
+                filt = Filter(h)
+                return np.stack([filt.apply(x) for x in xs])
+
+            cases = [
+                ("conv_dt_numpy", lambda h=h: np.stack([conv_dt_numpy(x, h) for x in xs])),
+                ("Filter.apply", filter_each),
+                ("Filter.apply_batch", lambda h=h: Filter(h).apply_batch(xs)),
+            ]
+            for name, func in cases:
+                row = {"function": name, "method": f"x{FILTER_INPUTS}", "n": N, "m": M, "dtype": "float64"}
+                row.update(measure(func, N * FILTER_INPUTS, repeat))
+                row["max_abs_error"], row["max_rel_error"] = accuracy(func(), y_ref)
+                results.append(row)
+
+    return results
+
+
+def bench_batch_stream(signal_lengths, kernel_lengths, repeat, rng):
+    """
+    conv_dt_batch / conv_ct_batch on BATCH_CHANNELS channels through one
+    kernel (every dense method), and StreamingConvolver fed the same
+    signal in STREAM_CHUNK sample chunks, then flushed.
+    """
+    results = []
+
+    for N in signal_lengths:
+        xs = rng.standard_normal((BATCH_CHANNELS, N))
+        n = np.arange(N)
+        t = np.linspace(-1, 1, N)
+        dt = t[1] - t[0]
+        for M in kernel_lengths:
+            h = rng.standard_normal(M)
+            y_ref = np.stack([np.convolve(x, h) for x in xs])
+
+            cases = []
+            for method in DENSE_METHODS:
+                cases.append((
+                    "conv_dt_batch", method,
+                    lambda method=method, h=h: conv_dt_batch(n, xs, np.arange(M), h, method=method)[1], y_ref
+                ))
+                cases.append((
+                    "conv_ct_batch", method,
+                    lambda method=method, h=h: conv_ct_batch(t, xs, h, method=method)[1], y_ref * dt
+                ))
+            for name, method, func, ref in cases:
+                row = {"function": name, "method": method, "n": N, "m": M, "dtype": "float64"}
+                row.update(measure(func, N * BATCH_CHANNELS, repeat))
+                row["max_abs_error"], row["max_rel_error"] = accuracy(func(), ref)
+                results.append(row)
+
+            def stream(h=h):
+                conv = StreamingConvolver(h)
+                outputs = [conv.process(xs[0, i:i + STREAM_CHUNK]) for i in range(0, N, STREAM_CHUNK)]
+                outputs.append(conv.flush())
+                return np.concatenate(outputs)
+
+            row = {"function": "StreamingConvolver", "method": f"chunk{STREAM_CHUNK}", "n": N, "m": M, "dtype": "float64"}
+            row.update(measure(stream, N, repeat))
+            row["max_abs_error"], row["max_rel_error"] = accuracy(stream(), y_ref[0])
+            results.append(row)
+
+    return results
+
+
+def bench_generators(signal_lengths, dtypes, repeat):
+    """
+    Sweep every generator in signal_generator.py over the signal lengths.
+
+    Every generator is called with dtype= on a float64 / integer axis, the
+    default (float64) output of the same generator is the accuracy reference.
+    """
+    results = []
+
+    for N in signal_lengths:
+        t = np.linspace(-1, 1, N)
+        n = np.arange(-(N // 2), N - N // 2)
+
+        for dtype in dtypes:
+            for name in GENERATORS_CT + GENERATORS_DT:
+                gen = getattr(signal_generator, name)
+                axis = t if name in GENERATORS_CT else n
+
+                row = {"function": name, "method": "-", "n": N, "m": 0, "dtype": dtype}
+                row.update(measure(lambda: gen(axis, dtype=dtype), N, repeat))
+                row["max_abs_error"], row["max_rel_error"] = accuracy(gen(axis, dtype=dtype), gen(axis))
+                results.append(row)
+
+    return results
+
+
+def run_benchmarks(quick=False, repeat=DEFAULT_REPEAT, seed=0):
+    """
+    Run the full sweep and return a JSON-ready dict.
+    """
+    rng = np.random.default_rng(seed)
+    signal_lengths = QUICK_SIGNAL_LENGTHS if quick else SIGNAL_LENGTHS
+    kernel_lengths = QUICK_KERNEL_LENGTHS if quick else KERNEL_LENGTHS
+
+    results = bench_convolution(signal_lengths, kernel_lengths, DTYPES, repeat, rng)
+    results += bench_structured(signal_lengths, kernel_lengths, repeat, rng)
+    results += bench_filter(signal_lengths, kernel_lengths, repeat, rng)
+    results += bench_batch_stream(signal_lengths, kernel_lengths, repeat, rng)
+    results += bench_generators(signal_lengths, DTYPES, repeat)
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+            "quick": quick,
+            "repeat": repeat,
+            "seed": seed,
+        },
+        "results": results,
+    }
+
+
+# ============================================================
+# COLD-START IMPORT CHECK
+# ============================================================
+_IMPORT_PROBE = (
+    "import sys, time; import numpy; start = time.perf_counter(); import {module}; "
+    "print(time.perf_counter() - start, 'matplotlib' in sys.modules)"
+)
+
+
+def import_time(module, repeat):
+    """
+    Best import time (seconds, numpy already loaded) of module in a fresh
+    interpreter, and whether that import pulled in matplotlib.
+    """
+    here = os.path.dirname(os.path.abspath(__file__))
+    best, loads_matplotlib = float("inf"), False
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, "-c", _IMPORT_PROBE.format(module=module)],
+            cwd=here, capture_output=True, text=True, check=True,
+        ).stdout.split()
+        best = min(best, float(out[0]))
+        loads_matplotlib |= out[1] == "True"
+    return best, loads_matplotlib
+
+
+def check_import_budget(repeat=3, budget=IMPORT_BUDGET_S):
+    """
+    Import every module of IMPORT_MODULES cold, return (rows, failures).
+    """
+    rows, failures = [], []
+    for module in IMPORT_MODULES:
+        seconds, loads_matplotlib = import_time(module, repeat)
+        rows.append({"module": module, "seconds": seconds, "matplotlib": loads_matplotlib})
+        if loads_matplotlib:
+            failures.append(f"{module} imports matplotlib")
+        if seconds > budget:
+            failures.append(f"{module} takes {seconds * 1e3:.1f} ms to import (budget {budget * 1e3:.0f} ms)")
+    return rows, failures
+
+
+# ============================================================
+# BASELINE COMPARISON
+# ============================================================
+def case_key(row):
+    return (row["function"], row["method"], row["n"], row["m"], row["dtype"])
+
+
+def keep_best_times(report, rerun):
+    """
+    Keep, per case, the faster time of report and rerun (in place).
+
+    A timing burst (another process, frequency scaling) lasts for many
+    cases in a row; a second sweep run later rarely hits the same cases.
+    """
+    rerun_rows = {case_key(row): row for row in rerun["results"]}
+    for row in report["results"]:
+        other = rerun_rows.get(case_key(row))
+        if other is not None and other["seconds"] < row["seconds"]:
+            samples = row["samples_per_s"] * row["seconds"]
+            row["seconds"] = other["seconds"]
+            row["samples_per_s"] = samples / other["seconds"] if other["seconds"] > 0 else float("inf")
+    return report
+
+
+def compare_to_baseline(current, baseline, tolerance=DEFAULT_TOLERANCE, time_floor=TIME_FLOOR_S):
+    """
+    List the cases of current that regressed against baseline.
+
+    A case regresses when it is more than `tolerance` (fraction) and more
+    than `time_floor` seconds slower, or when its relative error grew by
+    more than 10x (and above 1e-12). Cases missing from either run are ignored.
+    """
+    base_rows = {case_key(row): row for row in baseline["results"]}
+    regressions = []
+
+    for row in current["results"]:
+        base = base_rows.get(case_key(row))
+        if base is None:
+            continue
+
+        slower = row["seconds"] - base["seconds"]
+        if slower > base["seconds"] * tolerance and slower > time_floor:
+            regressions.append({
+                "case": case_key(row), "kind": "time",
+                "baseline": base["seconds"], "current": row["seconds"],
+            })
+
+        if row["max_rel_error"] > max(10 * base["max_rel_error"], 1e-12):
+            regressions.append({
+                "case": case_key(row), "kind": "accuracy",
+                "baseline": base["max_rel_error"], "current": row["max_rel_error"],
+            })
+
+    return regressions
+
+
+def print_table(report):
+    header = f"{'function':<20}{'method':<12}{'n':>9}{'m':>7}{'dtype':>9}{'Msamples/s':>12}{'peak MB':>10}{'rel err':>11}"
+    print(header)
+    print("-" * len(header))
+    for row in report["results"]:
+        print(
+            f"{row['function']:<20}{row['method']:<12}{row['n']:>9}{row['m']:>7}{row['dtype']:>9}"
+            f"{row['samples_per_s'] / 1e6:>12.2f}{row['peak_bytes'] / 2**20:>10.2f}{row['max_rel_error']:>11.2e}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the signal analyzer toolkit.")
+    parser.add_argument("--quick", action="store_true", help="smaller sweep for a fast check")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="timing repeats per case (best is kept)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="JSON file of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed slowdown vs baseline as a fraction (default 0.25)")
+    parser.add_argument("--time-floor", type=float, default=TIME_FLOOR_S,
+                        help="slowdowns below this many seconds are never regressions")
+    parser.add_argument("--imports", action="store_true",
+                        help="only check that every module imports cold within IMPORT_BUDGET_S")
+    args = parser.parse_args(argv)
+
+    if args.imports:
+        rows, failures = check_import_budget(repeat=args.repeat)
+        for row in rows:
+            print(f"{row['module']:<20}{row['seconds'] * 1e3:>8.1f} ms   matplotlib: {row['matplotlib']}")
+        print(f"\n{len(failures)} import budget failure(s)")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1 if failures else 0
+
+    report = run_benchmarks(quick=args.quick, repeat=args.repeat, seed=args.seed)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(report, baseline, args.tolerance, args.time_floor)
+        if any(reg["kind"] == "time" for reg in regressions):
+            # confirm slowdowns with a second sweep before failing
+            print(f"{len(regressions)} possible regression(s), running the sweep again to confirm")
+            rerun = run_benchmarks(quick=args.quick, repeat=args.repeat, seed=args.seed)
+            report = keep_best_times(report, rerun)
+            regressions = compare_to_baseline(report, baseline, args.tolerance, args.time_floor)
+
+    print_table(report)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.out}")
+
+    if args.baseline:
+        print(f"\n{len(regressions)} regression(s) against {args.baseline}")
+        for reg in regressions:
+            print(f"  {reg['kind']:<9}{reg['case']}: {reg['baseline']:.3e} -> {reg['current']:.3e}")
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+###STREAMING CONVOLUTION CLIENT
+#asyncio client for conv_service.py.
+#
+#   client = await ConvClient.connect(port=8765)
+#   await client.register({"generator": "exp_decay_dt", "n": [0, 64], "params": {"a": 0.9}})
+#   y = await client.process(x_chunk)        # one round trip per chunk
+#   tail = await client.flush()
+#   await client.close()
+#
+#send() / receive() split a round trip so several chunks can be in flight
+#(the server answers in order). from a single task keep at most the server's
+#max_pending chunks ahead; for deeper pipelines send and receive from two
+#tasks (as conv_loadtest.py does), otherwise both sides can end up blocked
+#writing to a peer that is not reading.
+#
+#the script streams a noisy sine through a kernel and checks the result
+#against conv_dt_numpy / conv_ct_manual on the whole signal:
+#   python conv_client.py --port 8765
+#   python conv_client.py --local             (starts a server in-process)
+
+import argparse
+import asyncio
+import sys
+
+import numpy as np
+
+from convolution import conv_dt_numpy, conv_ct_manual
+from conv_service import (
+    KIND_JSON, ConvolutionServer, ProtocolError,
+    pack_json, pack_samples, unpack_samples, read_frame,
+)
+from signal_generator import sin_ct, sin_dt, impulse_like_ct, exp_decay_dt
+
+
+class ServiceError(Exception):
+    """
+    The server answered a request with {"ok": false, "error": ...}.
+    """
+
+
+class ConvClient:
+    """
+    One session with a convolution server.
+    """
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.info = None
+
+    @classmethod
+    async def connect(cls, host="127.0.0.1", port=None, path=None):
+        """
+        Open a session over TCP (host, port) or a Unix socket path.
+        """
+        if path is not None:
+            reader, writer = await asyncio.open_unix_connection(path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def register(self, kernel=None, samples=None, dt=1.0, dtype="float64", block_size=None):
+        """
+        Set the session's impulse response: a generator kernel spec
+        (see conv_service.py) or raw samples (scaled by dt if given).
+
+        Returns the server's reply (taps, block_size, dt, h_start ...).
+        """
+        if (kernel is None) == (samples is None):
+            raise ValueError("Pass either a kernel spec or samples.")
+        if samples is not None:
+            kernel = {"samples": True, "dt": dt}
+        self.writer.write(pack_json({"op": "register", "kernel": kernel, "dtype": dtype, "block_size": block_size}))
+        if samples is not None:
+            self.writer.write(pack_samples(samples, dtype))
+        await self.writer.drain()
+
+        self.info = await self._reply_json()
+        return self.info
+
+    async def send(self, chunk):
+        """
+        Send one input chunk without waiting for its output.
+        """
+        self.writer.write(pack_samples(chunk, self.info["dtype"]))
+        await self.writer.drain()
+
+    async def receive(self):
+        """
+        Output of the oldest chunk sent and not received yet.
+        """
+        frame = await read_frame(self.reader)
+        if frame is None:
+            raise ConnectionError("Server closed the session.")
+        kind, payload = frame
+        if kind == KIND_JSON:
+            raise ServiceError(payload.get("error", payload))
+        return unpack_samples(payload, self.info["dtype"])
+
+    async def process(self, chunk):
+        """
+        len(chunk) output samples for the next input chunk.
+        """
+        await self.send(chunk)
+        return await self.receive()
+
+    async def flush(self):
+        """
+        The last M - 1 output samples, the stream then starts over.
+        """
+        self.writer.write(pack_json({"op": "flush"}))
+        await self.writer.drain()
+        return await self.receive()
+
+    async def close(self):
+        """
+        End the session, returns the server's final message.
+        """
+        self.writer.write(pack_json({"op": "close"}))
+        await self.writer.drain()
+        try:
+            reply = await self._reply_json()
+        finally:
+            self.writer.close()
+            await self.writer.wait_closed()
+        return reply
+
+    async def _reply_json(self):
+        frame = await read_frame(self.reader)
+        if frame is None:
+            raise ConnectionError("Server closed the session.")
+        kind, payload = frame
+        if kind != KIND_JSON:
+            raise ProtocolError("Expected a JSON reply.")
+        if not payload.get("ok"):
+            raise ServiceError(payload.get("error"))
+        return payload
+
+
+# -----------------------------
+# DEMO / CHECK
+# -----------------------------
+async def check_stream(client, ct=False, n_samples=20_000, chunk=1_000, seed=0):
+    """
+    Stream a noisy sine through the server, return the max abs error
+    against the same convolution computed in one call.
+    """
+    rng = np.random.default_rng(seed)
+    if ct:
+        t_h = np.linspace(-0.05, 0.05, 101)
+        dt = t_h[1] - t_h[0]
+        t = np.arange(n_samples) * dt
+        x = sin_ct(t, f=5) + 0.05 * rng.standard_normal(n_samples)
+        await client.register({"generator": "impulse_like_ct", "t": [-0.05, 0.05, 101], "params": {"width": 0.02}})
+        _, y_ref = conv_ct_manual(t, x, impulse_like_ct(t_h, width=0.02))
+    else:
+        n = np.arange(n_samples)
+        x = sin_dt(n, f=0.05) + 0.05 * rng.standard_normal(n_samples)
+        await client.register({"generator": "exp_decay_dt", "n": [0, 64], "params": {"a": 0.9}})
+        y_ref = conv_dt_numpy(x, exp_decay_dt(np.arange(64), a=0.9))
+
+    # two chunks in flight: the next chunk is sent before the previous output is read
+    outputs = []
+    await client.send(x[:chunk])
+    for start in range(chunk, n_samples, chunk):
+        await client.send(x[start:start + chunk])
+        outputs.append(await client.receive())
+    outputs.append(await client.receive())
+    outputs.append(await client.flush())
+
+    y = np.concatenate(outputs)
+    return float(np.max(np.abs(y - y_ref)))
+
+
+async def _demo(args):
+    server = None
+    if args.local:
+        server = await ConvolutionServer().start(port=0, path=args.unix)
+        host, port = (None, None) if args.unix else server.address
+    else:
+        host, port = args.host, args.port
+
+    try:
+        for ct in (False, True):
+            client = await ConvClient.connect(host, port, path=args.unix)
+            err = await check_stream(client, ct=ct, n_samples=args.samples, chunk=args.chunk)
+            info = await client.close()
+            print(f"{'CT' if ct else 'DT'} stream: {info['samples_in']} samples, max abs error vs one-shot: {err:.3e}")
+    finally:
+        if server is not None:
+            await server.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check a streaming convolution server against conv_*.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", metavar="PATH", default=None, help="connect to a Unix socket instead of TCP")
+    parser.add_argument("--local", action="store_true", help="start a server in this process")
+    parser.add_argument("--samples", type=int, default=20_000)
+    parser.add_argument("--chunk", type=int, default=1_000)
+    args = parser.parse_args(argv)
+    asyncio.run(_demo(args))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
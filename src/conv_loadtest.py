@@ -0,0 +1,153 @@
+###LOAD TEST FOR THE CONVOLUTION SERVICE
+#opens many concurrent sessions against conv_service.py, streams random
+#frames through each of them and reports per-frame round-trip latency
+#percentiles and the total throughput.
+#
+#every session keeps up to --in-flight frames sent but not answered yet;
+#with more than the server's max_pending the server stops reading and the
+#sender is held back by TCP (backpressure), which shows up as latency.
+#
+#usage (from src/):
+#   python conv_loadtest.py --local --sessions 32 --frames 200 --frame-size 1024
+#   python conv_loadtest.py --port 8765 --taps 4096 --out load.json
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+from conv_client import ConvClient
+from conv_service import ConvolutionServer, DEFAULT_MAX_PENDING
+
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+async def run_session(host, port, path, kernel, frames, frame_size, in_flight, dtype, seed):
+    """
+    Stream frames random frames through one session.
+
+    Sending and receiving run as two tasks, so the sender can be held back
+    by the server without the replies piling up unread.
+
+    Returns the round-trip latency (seconds) of every frame.
+    """
+    rng = np.random.default_rng(seed)
+    client = await ConvClient.connect(host, port, path=path)
+    await client.register(kernel, dtype=dtype)
+
+    x = rng.standard_normal(frame_size).astype(dtype)
+    window = asyncio.Semaphore(in_flight)
+    sent = deque()
+    latencies = []
+
+    async def sender():
+        for _ in range(frames):
+            await window.acquire()
+            sent.append(time.perf_counter())
+            await client.send(x)
+
+    async def receiver():
+        for _ in range(frames):
+            y = await client.receive()
+            latencies.append(time.perf_counter() - sent.popleft())
+            window.release()
+            if len(y) != frame_size:
+                raise RuntimeError(f"Got {len(y)} output samples for a {frame_size} sample frame.")
+
+    await asyncio.gather(sender(), receiver())
+    await client.flush()
+    await client.close()
+    return latencies
+
+
+async def run_load(host=None, port=None, path=None, sessions=16, frames=100, frame_size=1024,
+                   taps=256, in_flight=4, dtype="float64", local=False, max_pending=DEFAULT_MAX_PENDING):
+    """
+    Run every session concurrently, return a JSON-ready summary.
+    """
+    server = None
+    if local:
+        server = await ConvolutionServer(max_sessions=max(sessions, 1), max_pending=max_pending).start(port=0, path=path)
+        if path is None:
+            host, port = server.address
+
+    kernel = {"generator": "exp_decay_dt", "n": [0, taps], "params": {"a": 0.99}}
+    try:
+        start = time.perf_counter()
+        results = await asyncio.gather(*(
+            run_session(host, port, path, kernel, frames, frame_size, in_flight, dtype, seed)
+            for seed in range(sessions)
+        ))
+        wall = time.perf_counter() - start
+    finally:
+        if server is not None:
+            await server.close()
+
+    latencies = np.concatenate([np.asarray(r) for r in results])
+    total_samples = sessions * frames * frame_size
+    return {
+        "sessions": sessions,
+        "frames_per_session": frames,
+        "frame_size": frame_size,
+        "taps": taps,
+        "in_flight": in_flight,
+        "dtype": dtype,
+        "wall_seconds": wall,
+        "samples_per_s": total_samples / wall,
+        "frames_per_s": len(latencies) / wall,
+        "latency_ms": {
+            **{f"p{p:g}": float(np.percentile(latencies, p) * 1e3) for p in PERCENTILES},
+            "mean": float(latencies.mean() * 1e3),
+            "max": float(latencies.max() * 1e3),
+        },
+    }
+
+
+def print_report(report):
+    print(
+        f"{report['sessions']} sessions x {report['frames_per_session']} frames of {report['frame_size']} "
+        f"samples, {report['taps']} taps, {report['in_flight']} in flight, {report['dtype']}"
+    )
+    print(f"wall {report['wall_seconds']:.3f} s, {report['frames_per_s']:.0f} frames/s, "
+          f"{report['samples_per_s'] / 1e6:.2f} Msamples/s")
+    print("latency (ms): " + "  ".join(f"{k} {v:.3f}" for k, v in report["latency_ms"].items()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test for the streaming convolution server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", metavar="PATH", default=None, help="Unix socket instead of TCP")
+    parser.add_argument("--local", action="store_true", help="start a server in this process")
+    parser.add_argument("--sessions", type=int, default=16)
+    parser.add_argument("--frames", type=int, default=100, help="frames per session")
+    parser.add_argument("--frame-size", type=int, default=1024, help="samples per frame")
+    parser.add_argument("--taps", type=int, default=256, help="kernel length")
+    parser.add_argument("--in-flight", type=int, default=4, help="frames sent ahead per session")
+    parser.add_argument("--max-pending", type=int, default=DEFAULT_MAX_PENDING,
+                        help="server queue per session (with --local)")
+    parser.add_argument("--dtype", choices=["float32", "float64"], default="float64")
+    parser.add_argument("--out", help="write the report to this JSON file")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run_load(
+        host=args.host, port=args.port, path=args.unix, sessions=args.sessions, frames=args.frames,
+        frame_size=args.frame_size, taps=args.taps, in_flight=max(args.in_flight, 1), dtype=args.dtype,
+        local=args.local, max_pending=args.max_pending,
+    ))
+    print_report(report)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,411 @@
+###STREAMING CONVOLUTION SERVICE
+#runs StreamingConvolver as a long-lived asyncio server (TCP or Unix socket).
+#every connection is a session with its own impulse response and stream state,
+#sessions run concurrently.
+#
+#framing (both directions): 1 byte kind | 4 bytes payload length (big-endian) | payload
+#   kind 1 (JSON): a control message, utf-8 JSON object
+#   kind 2 (DATA): raw samples in the session dtype, little-endian
+#
+#a session:
+#   -> JSON {"op": "register", "kernel": {...}, "dtype": "float64", "block_size": null}
+#   <- JSON {"ok": true, "taps": M, "block_size": B, "dtype": ..., "dt": ..., "h_start": ...}
+#   -> DATA chunk               <- DATA, len(chunk) output samples
+#   -> JSON {"op": "flush"}     <- DATA, the last M - 1 output samples (stream restarts)
+#   -> JSON {"op": "close"}     <- JSON {"ok": true, "samples_in": ...}
+#errors are answered with {"ok": false, "error": "..."}, the session stays usable
+#(a malformed frame closes it).
+#
+#kernel specs:
+#   {"generator": "exp_decay_dt", "n": [0, 64], "params": {"a": 0.9}}
+#   {"generator": "impulse_like_ct", "t": [-0.1, 0.1, 201], "params": {"width": 0.02}}
+#   {"samples": true}  (the samples follow in the next DATA frame, "dt" optional)
+#a CT kernel (t grid or "dt") is scaled by dt, so the stream matches conv_ct_manual;
+#concatenated output sample k sits at x_start + h_start + k * dt.
+#kernels are limited to max_taps samples (checked before the axis is built)
+#and block_size to the samples one frame can carry.
+#
+#backpressure: frames of a session go through a queue of max_pending frames.
+#when it is full the server stops reading that socket, so a fast sender is
+#throttled by TCP instead of growing server memory; replies wait on drain().
+#
+#the convolution itself runs in a thread pool (numpy's FFT and np.convolve
+#release the GIL), so a large frame does not stall the event loop and the
+#other sessions. a session waits for each frame before the next one, so its
+#frames are still answered in order.
+#
+#usage (from src/):
+#   python conv_service.py --port 8765
+#   python conv_service.py --unix /tmp/conv.sock
+
+import argparse
+import asyncio
+import json
+import os
+import struct
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import signal_generator
+from convolution import StreamingConvolver
+
+
+KIND_JSON = 1
+KIND_DATA = 2
+
+_HEADER = struct.Struct("!BI")
+
+DEFAULT_PORT = 8765
+DEFAULT_MAX_SESSIONS = 64
+DEFAULT_MAX_PENDING = 8             # frames queued per session
+DEFAULT_MAX_FRAME = 8 * 2**20       # bytes
+DEFAULT_MAX_TAPS = 2**20            # kernel samples
+
+#generators a kernel can be built from
+KERNEL_GENERATORS = [
+    "unit_step_ct", "ramp_ct", "sin_ct", "exp_decay_ct", "impulse_like_ct",
+    "unit_step_dt", "ramp_dt", "sin_dt", "exp_decay_dt", "impulse_dt",
+]
+SESSION_DTYPES = ["float32", "float64"]
+
+
+class ProtocolError(Exception):
+    """
+    A malformed frame: the session cannot continue.
+    """
+
+
+# -----------------------------
+# FRAMING
+# -----------------------------
+def pack_frame(kind, payload):
+    return _HEADER.pack(kind, len(payload)) + payload
+
+
+def pack_json(message):
+    return pack_frame(KIND_JSON, json.dumps(message).encode())
+
+
+def pack_samples(x, dtype):
+    return pack_frame(KIND_DATA, np.asarray(x, dtype=np.dtype(dtype).newbyteorder("<")).tobytes())
+
+
+def unpack_samples(payload, dtype):
+    dtype = np.dtype(dtype).newbyteorder("<")
+    if len(payload) % dtype.itemsize:
+        raise ProtocolError(f"DATA frame of {len(payload)} bytes is not a whole number of {dtype.name} samples.")
+    return np.frombuffer(payload, dtype=dtype)
+
+
+async def read_frame(reader, max_bytes=DEFAULT_MAX_FRAME):
+    """
+    Next (kind, payload) from the stream, None at a clean end of stream.
+    """
+    try:
+        header = await reader.readexactly(_HEADER.size)
+    except asyncio.IncompleteReadError as e:
+        if e.partial:
+            raise ProtocolError("Connection closed inside a frame header.")
+        return None
+
+    kind, length = _HEADER.unpack(header)
+    if kind not in (KIND_JSON, KIND_DATA):
+        raise ProtocolError(f"Unknown frame kind {kind}.")
+    if length > max_bytes:
+        raise ProtocolError(f"Frame of {length} bytes is over the {max_bytes} byte limit.")
+
+    try:
+        payload = await reader.readexactly(length)
+    except asyncio.IncompleteReadError:
+        raise ProtocolError("Connection closed inside a frame.")
+    if kind == KIND_JSON:
+        try:
+            payload = json.loads(payload)
+        except ValueError:
+            raise ProtocolError("JSON frame does not hold valid JSON.")
+        if not isinstance(payload, dict):
+            raise ProtocolError("JSON frame must hold an object.")
+    return kind, payload
+
+
+# -----------------------------
+# KERNELS
+# -----------------------------
+def build_kernel(spec, dtype="float64", max_taps=DEFAULT_MAX_TAPS):
+    """
+    Impulse response samples for a generator kernel spec (see module header).
+
+    Returns (h, dt, h_start): h already scaled by dt for CT kernels,
+    dt = 1 for DT kernels. Specs asking for more than max_taps samples are
+    rejected before anything is allocated.
+    """
+    name = spec.get("generator")
+    if name not in KERNEL_GENERATORS:
+        raise ValueError(f"Unknown kernel generator {name!r}, expected one of {KERNEL_GENERATORS}.")
+    params = spec.get("params", {})
+    if not isinstance(params, dict):
+        raise ValueError("Kernel params must be an object.")
+
+    if name.endswith("_dt"):
+        start, stop = spec.get("n", (0, 0))
+        start, stop = int(start), int(stop)
+        _check_taps(stop - start, max_taps)
+        axis = np.arange(start, stop)
+        dt = 1.0
+    else:
+        start, stop, num = spec.get("t", (0, 0, 0))
+        num = int(num)
+        _check_taps(num, max_taps)
+        axis = np.linspace(float(start), float(stop), num)
+        if len(axis) < 2:
+            raise ValueError("A CT kernel needs at least 2 samples of t.")
+        dt = float(axis[1] - axis[0])
+
+    if len(axis) == 0:
+        raise ValueError("Kernel axis is empty.")
+    h = getattr(signal_generator, name)(axis, **params, dtype=dtype)
+    if dt != 1.0:
+        h *= dt
+    return h, dt, float(axis[0])
+
+
+def _check_taps(taps, max_taps):
+    if taps > max_taps:
+        raise ValueError(f"Kernel of {taps} samples is over the {max_taps} sample limit.")
+
+
+class _Session:
+    """
+    One connection: its dtype, its StreamingConvolver and the stream state.
+    """
+
+    def __init__(self, max_taps=DEFAULT_MAX_TAPS, max_frame_bytes=DEFAULT_MAX_FRAME):
+        self.max_taps = max_taps
+        self.max_frame_bytes = max_frame_bytes
+        self.dtype = None
+        self.conv = None
+        self.pending_samples = None     # register message waiting for its DATA frame
+        self.samples_in = 0             # over all streams of the session
+
+    def handle(self, kind, payload):
+        """
+        Answer one frame, returns the reply frame (bytes), or None while a
+        raw-sample registration waits for its DATA frame.
+        """
+        if kind == KIND_DATA:
+            if self.pending_samples is not None:
+                return self._register_samples(payload)
+            if self.conv is None:
+                return pack_json({"ok": False, "error": "Register a kernel before sending samples."})
+            y = self.conv.process(unpack_samples(payload, self.dtype))
+            self.samples_in += len(y)
+            return pack_samples(y, self.dtype)
+
+        op = payload.get("op")
+        if op == "register":
+            return self._register(payload)
+        if op == "flush":
+            if self.conv is None:
+                return pack_json({"ok": False, "error": "Register a kernel before flushing."})
+            return pack_samples(self.conv.flush(), self.dtype)
+        if op == "close":
+            return pack_json({"ok": True, "samples_in": self.samples_in})
+        return pack_json({"ok": False, "error": f"Unknown op {op!r}."})
+
+    def _register(self, message):
+        dtype = message.get("dtype", "float64")
+        if dtype not in SESSION_DTYPES:
+            return pack_json({"ok": False, "error": f"dtype must be one of {SESSION_DTYPES}."})
+        kernel = message.get("kernel") or {}
+
+        try:
+            if kernel.get("samples"):
+                # the samples arrive in the next DATA frame
+                self.pending_samples = (dtype, message.get("block_size"), float(kernel.get("dt", 1.0)))
+                return None
+            h, dt, h_start = build_kernel(kernel, dtype, self.max_taps)
+        except (TypeError, ValueError, OverflowError) as e:
+            return pack_json({"ok": False, "error": str(e)})
+        return self._start(h, dtype, message.get("block_size"), dt, h_start)
+
+    def _register_samples(self, payload):
+        dtype, block_size, dt = self.pending_samples
+        self.pending_samples = None
+        h = np.array(unpack_samples(payload, dtype))
+        try:
+            _check_taps(len(h), self.max_taps)
+        except ValueError as e:
+            return pack_json({"ok": False, "error": str(e)})
+        if dt != 1.0:
+            h *= dt
+        return self._start(h, dtype, block_size, dt, 0.0)
+
+    def _start(self, h, dtype, block_size, dt, h_start):
+        # a block never needs more samples than one frame can carry
+        max_block = self.max_frame_bytes // np.dtype(dtype).itemsize
+        if block_size is not None and not 1 <= block_size <= max_block:
+            return pack_json({"ok": False, "error": f"block_size must be in [1, {max_block}]."})
+        try:
+            conv = StreamingConvolver(h, block_size=block_size)
+        except (TypeError, ValueError) as e:
+            return pack_json({"ok": False, "error": str(e)})
+        self.conv = conv
+        self.dtype = dtype
+        return pack_json({
+            "ok": True, "taps": len(h), "block_size": conv.block_size,
+            "dtype": dtype, "dt": dt, "h_start": h_start,
+        })
+
+
+# -----------------------------
+# SERVER
+# -----------------------------
+class ConvolutionServer:
+    """
+    asyncio server running one StreamingConvolver per connection.
+
+    Inputs:
+    - max_sessions: connections served at once, more are refused with an error
+    - max_pending: frames queued per session before the socket stops being read
+    - max_frame_bytes: larger frames are a protocol error
+    - max_taps: longest kernel a session may register
+    - workers: threads running the convolutions (None = one per CPU)
+
+    Example:
+        server = await ConvolutionServer().start(port=0)
+        host, port = server.address
+        ...
+        await server.close()
+    """
+
+    def __init__(self, max_sessions=DEFAULT_MAX_SESSIONS, max_pending=DEFAULT_MAX_PENDING,
+                 max_frame_bytes=DEFAULT_MAX_FRAME, max_taps=DEFAULT_MAX_TAPS, workers=None):
+        self.max_sessions = max_sessions
+        self.max_pending = max_pending
+        self.max_frame_bytes = max_frame_bytes
+        self.max_taps = max_taps
+        self.executor = ThreadPoolExecutor(workers or os.cpu_count() or 1, thread_name_prefix="conv")
+        self.server = None
+        self.address = None
+        self.stats = {"sessions": 0, "active": 0, "refused": 0, "frames": 0, "errors": 0}
+
+    async def start(self, host="127.0.0.1", port=DEFAULT_PORT, path=None):
+        """
+        Listen on host:port (port 0 = any free port) or on a Unix socket path.
+        """
+        if path is not None:
+            self.server = await asyncio.start_unix_server(self._handle, path=path)
+            self.address = path
+        else:
+            self.server = await asyncio.start_server(self._handle, host, port)
+            self.address = self.server.sockets[0].getsockname()[:2]
+        return self
+
+    async def serve_forever(self):
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _handle(self, reader, writer):
+        if self.stats["active"] >= self.max_sessions:
+            self.stats["refused"] += 1
+            writer.write(pack_json({"ok": False, "error": "Server busy, too many sessions."}))
+            await _close_writer(writer)
+            return
+
+        self.stats["sessions"] += 1
+        self.stats["active"] += 1
+        queue = asyncio.Queue(self.max_pending)
+        worker = asyncio.create_task(self._run_session(queue, writer, asyncio.current_task()))
+        try:
+            while True:
+                frame = await read_frame(reader, self.max_frame_bytes)
+                # blocks while the queue is full: nothing more is read from the socket
+                await queue.put(frame)
+                if frame is None:
+                    break
+            await worker
+        except ProtocolError as e:
+            self.stats["errors"] += 1
+            worker.cancel()
+            writer.write(pack_json({"ok": False, "error": str(e)}))
+        except (asyncio.CancelledError, ConnectionError):
+            worker.cancel()
+        finally:
+            self.stats["active"] -= 1
+            await _close_writer(writer)
+
+    async def _run_session(self, queue, writer, reader_task):
+        session = _Session(self.max_taps, self.max_frame_bytes)
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                frame = await queue.get()
+                if frame is None:
+                    return
+                self.stats["frames"] += 1
+                try:
+                    # off the event loop; awaited, so one frame at a time per session
+                    reply = await loop.run_in_executor(self.executor, session.handle, *frame)
+                except ProtocolError as e:
+                    self.stats["errors"] += 1
+                    writer.write(pack_json({"ok": False, "error": str(e)}))
+                    reader_task.cancel()
+                    return
+                except Exception as e:
+                    # a bad request must not stop the session
+                    self.stats["errors"] += 1
+                    reply = pack_json({"ok": False, "error": f"{type(e).__name__}: {e}"})
+                if reply is not None:
+                    writer.write(reply)
+                    await writer.drain()
+                if frame[0] == KIND_JSON and frame[1].get("op") == "close":
+                    reader_task.cancel()
+                    return
+        except ConnectionError:
+            reader_task.cancel()
+
+
+async def _close_writer(writer):
+    try:
+        await writer.drain()
+        writer.close()
+        await writer.wait_closed()
+    except ConnectionError:
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Streaming convolution server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", metavar="PATH", default=None, help="listen on a Unix socket instead of TCP")
+    parser.add_argument("--max-sessions", type=int, default=DEFAULT_MAX_SESSIONS)
+    parser.add_argument("--max-pending", type=int, default=DEFAULT_MAX_PENDING,
+                        help="frames buffered per session before reading pauses")
+    parser.add_argument("--max-taps", type=int, default=DEFAULT_MAX_TAPS, help="longest kernel a session may register")
+    parser.add_argument("--workers", type=int, default=None, help="convolution threads (default: one per CPU)")
+    args = parser.parse_args(argv)
+
+    async def serve():
+        server = ConvolutionServer(max_sessions=args.max_sessions, max_pending=args.max_pending,
+                                   max_taps=args.max_taps, workers=args.workers)
+        await server.start(args.host, args.port, path=args.unix)
+        print(f"Serving on {server.address}")
+        await server.serve_forever()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,45 @@
 ###DT CONVOLUTION
 
+import hashlib
+from collections import OrderedDict
+
 import numpy as np
 
-def conv_dt_manual(x, h):
+from dtypes import get_default_dtype, resolve_dtype
+from instrument import instrumented
+
+@instrumented
+def conv_dt_manual(x, h, method="vectorized", mode="full", dtype=None):
     """
     If x has length N and h has length M,
     output y will have length N + M - 1
     operation: y[n] = sum_k x[k] * h[n-k] (convolution)
+
+    Computed from the sum itself (no np.convolve / FFT), so it is an
+    independent reference for checking conv_dt_numpy.
+
+    method:
+    - "vectorized": shift-and-add, one array operation per sample of the
+      shorter signal
+    - "slow": the original double loop, one multiply per Python step
+
+    mode - "full", "same" or "valid" (see conv_dt_numpy)
+    dtype - inputs are cast to this dtype first (None: keep them, see dtypes.py)
+    """
+    if method not in ("vectorized", "slow"):
+        raise ValueError(f"Unknown manual convolution method {method!r}, expected 'vectorized' or 'slow'.")
+
+    x, h = _check_conv_inputs(x, h, dtype)
+    start, length = _output_region(len(x), len(h), mode)
+
+    if method == "slow":
+        return _conv_dt_loop(x, h)[start:start + length]
+    return _conv_shift_add(x, h, start, length)
+
+
+def _conv_dt_loop(x, h):
+    """
+    Nested-loop reference: y[n] = sum_k x[k] * h[n-k], one term at a time.
     """
 
     N = len(x)
@@ -14,7 +47,7 @@ def conv_dt_manual(x, h):
 
     y_length = N + M - 1
 
-    y = np.zeros(y_length)
+    y = np.zeros(y_length, dtype=_result_dtype(x, h))
 
     for n in range(y_length):
         total = 0
@@ -25,14 +58,121 @@ def conv_dt_manual(x, h):
 
     return y
 
-def conv_dt_numpy(x, h):
+
+def _conv_shift_add(x, h, start=0, length=None):
+    """
+    Vectorized form of y[n] = sum_k x[k] * h[n-k] along the last axis.
+
+    Row k of the sum is the long signal shifted right by k and scaled by
+    the k-th sample of the short one, so the whole sum is M shifted adds.
+    Only outputs y[start : start + length] are computed.
+    """
+    # convolution is commutative: loop over the shorter signal
+    if h.shape[-1] > x.shape[-1]:
+        x, h = h, x
+
+    N = x.shape[-1]
+    M = h.shape[-1]
+    if length is None:
+        length = N + M - 1
+
+    # y[start + i] needs x[start + i - k] for k = 0 .. M-1
+    seg = _padded_segment(x, start - (M - 1), start + length)
+
+    shape = np.broadcast_shapes(x.shape[:-1], h.shape[:-1]) + (length,)
+    y = np.zeros(shape, dtype=_result_dtype(x, h))
+
+    for k in range(M):
+        y += h[..., k:k + 1] * seg[..., M - 1 - k:M - 1 - k + length]
+
+    return y
+
+
+def _padded_segment(x, lo, hi):
+    """
+    x[..., lo:hi] where indices outside 0 .. N-1 read as zeros.
+    """
+    N = x.shape[-1]
+    if lo >= 0 and hi <= N:
+        return x[..., lo:hi]
+
+    seg = np.zeros(x.shape[:-1] + (hi - lo,), dtype=x.dtype)
+    a = max(lo, 0)
+    b = min(hi, N)
+    if b > a:
+        seg[..., a - lo:b - lo] = x[..., a:b]
+    return seg
+
+
+@instrumented
+def conv_dt_numpy(x, h, method="auto", mode="full", dtype=None):
+    """
+    Use numpy to perform DT convolution.
+
+    method:
+    - "direct": np.convolve, O(N*M)
+    - "fft": one FFT of the whole zero-padded signal, O((N+M) log(N+M))
+    - "oa": overlap-add FFT in blocks, best when one signal is much longer
+    - "sparse": shift-and-add over the nonzero samples of the sparser
+      signal only, O(N * nnz) (e.g. impulse_dt)
+    - "boxcar": one signal is a constant run of samples (e.g.
+      impulse_like_ct), done as a moving sum with a cumulative sum, O(N + M)
+    - "auto": pick one of the above from the input lengths, using
+      "sparse" / "boxcar" when either signal has that structure
+
+    mode (same meaning as in np.convolve):
+    - "full": all N + M - 1 outputs
+    - "same": max(N, M) outputs, centred on the full output
+    - "valid": the max(N, M) - min(N, M) + 1 outputs where the signals
+      overlap completely
+    only the requested outputs are computed, use conv_output_index_dt with
+    the same mode for the matching index array.
+
+    dtype - inputs are cast to this dtype first (e.g. np.float32 to halve
+    the memory traffic). None keeps float inputs as they are, so float32 in
+    gives float32 out; integer inputs give the default dtype (dtypes.py),
+    except "direct"/"sparse"/"boxcar" which keep exact integer outputs.
+    """
+    x, h = _check_conv_inputs(x, h, dtype)
+    return _cached(
+        "conv_dt_numpy", (x, h), (method, mode),
+        lambda: _convolve(x, h, method, _output_region(len(x), len(h), mode)),
+    )
+
+
+@instrumented
+def conv_dt_fft(x, h, mode="full", dtype=None):
+    """
+    DT convolution through the FFT.
+
+    Both signals are zero padded to a fast transform length >= N + M - 1,
+    so the circular convolution of the FFT equals the linear one.
+    (for "same"/"valid" a shorter transform is enough, see _conv_fft)
     """
-    Use numpy's built-in convolution function to perform DT convolution.
+    # same work as conv_dt_numpy(method="fft"), without a second instrumented call
+    x, h = _check_conv_inputs(x, h, dtype)
+    return _cached(
+        "conv_dt_numpy", (x, h), ("fft", mode),
+        lambda: _convolve(x, h, "fft", _output_region(len(x), len(h), mode)),
+    )
+
+
+@instrumented
+def conv_dt_overlap_add(x, h, block_size=None, mode="full", dtype=None):
     """
-    return np.convolve(x, h)
+    DT convolution with the overlap-add method.
 
+    The longer signal is cut into blocks, every block is convolved with the
+    shorter one through a small FFT, and the block outputs are added back
+    together with their overlapping tails.
+    block_size - samples of the long signal per block (chosen from M if None)
+    """
+    x, h = _check_conv_inputs(x, h, dtype)
+    start, length = _output_region(len(x), len(h), mode)
+    return _conv_overlap_add(x, h, block_size)[start:start + length]
 
-def conv_output_index_dt(n_x, n_h):
+
+def conv_output_index_dt(n_x, n_h, mode="full"):
     """
     Finds the correct output index array for y[n] = x[n] * h[n].
 
@@ -45,6 +185,9 @@ def conv_output_index_dt(n_x, n_h):
     After convolution, output indices ALWAYS range from:
         start = (start index of x) + (start index of h)
         end   = (end index of x)   + (end index of h)
+
+    For mode="same" / "valid" only the indices of that part of the output
+    are returned (matching conv_dt_numpy(..., mode=mode)).
     """
 
     n_start = n_x[0] + n_h[0]
@@ -52,13 +195,18 @@ def conv_output_index_dt(n_x, n_h):
 
     n_y = np.arange(n_start, n_end + 1)
 
+    if mode != "full":
+        start, length = _output_region(len(n_x), len(n_h), mode)
+        n_y = n_y[start:start + length]
+
     return n_y
 
 
 
 
 ### CT CONVOLUTION
-def conv_ct_manual(t, x, h):
+@instrumented
+def conv_ct_manual(t, x, h, method="auto", mode="full", dtype=None):
     """
     Numerical approximation of continuous-time convolution.
 
@@ -71,15 +219,992 @@ def conv_ct_manual(t, x, h):
     Assumptions:
     - t is uniformly spaced (constant dt)
     - x and h are sampled on the same time grid
+
+    method - same choices as conv_dt_numpy ("auto", "direct", "fft", "oa",
+             "sparse", "boxcar")
+
+    mode:
+    - "full": the whole output, from t[0] + t[0] to t[-1] + t[-1]
+    - "same": len(x) outputs on the time grid of x, i.e. y(t) at the
+      same instants as x(t). exactly aligned when t contains t = 0
+      (t[0] is a multiple of dt); otherwise t_y is offset from t by the
+      fraction of dt that separates the grid from 0.
+    - "valid": the part where x and h overlap completely (as np.convolve)
+    only the requested outputs are computed.
+
+    dtype - as in conv_dt_numpy; dt is cast to the output dtype, so a
+    float64 time axis does not upcast float32 signals.
     """
+    x, h = _check_conv_inputs(x, h, dtype)
+    return _cached("conv_ct_manual", (t, x, h), (method, mode), lambda: _conv_ct(t, x, h, method, mode))
+
+
+def _conv_ct(t, x, h, method, mode):
     dt = t[1] - t[0]
 
-    y = np.convolve(x, h) * dt
+    start, length = _ct_region(t, x.shape[-1], h.shape[-1], mode)
+    y = np.multiply(_convolve(x, h, method, (start, length)), dt, dtype=_result_dtype(x, h))
+
+    t_y = _ct_output_axis(t, x.shape[-1] + h.shape[-1] - 1, start, length)
+    return t_y, y
+
+
+def _ct_region(t, N, M, mode):
+    """
+    (start, length) of a CT output mode within the full output.
+    """
+    if mode != "same":
+        return _output_region(N, M, mode)
+
+    # full output sample k sits at t_y = t[0] + t[0] + k*dt,
+    # so t_y = t[0] is reached at k = -t[0]/dt
+    dt = t[1] - t[0]
+    start = int(np.floor(-t[0] / dt + 0.5))
+    return start, N
 
+
+def _ct_output_axis(t, full_length, start=0, length=None):
+    """
+    Time axis of a CT convolution output when x and h share the grid t.
+
+    The full axis runs from t[0] + t[0] to t[-1] + t[-1] in full_length
+    samples; start/length select the part that was computed.
+    """
     t_start = t[0] + t[0]
     t_end = t[-1] + t[-1]
 
-    t_y = np.linspace(t_start, t_end, len(y))
-    return t_y, y
+    if length is None or (start == 0 and length == full_length):
+        return np.linspace(t_start, t_end, full_length)
+
+    step = (t_end - t_start) / (full_length - 1) if full_length > 1 else t[1] - t[0]
+    return t_start + (start + np.arange(length)) * step
+
+
+
+
+### BATCHED (MULTI-CHANNEL) CONVOLUTION
+@instrumented
+def conv_dt_batch(n_x, x, n_h, h, method="auto", mode="full", dtype=None):
+    """
+    Convolve many DT channels at once.
+
+    Inputs:
+    - n_x: index array shared by all input channels (length N)
+    - x: (channels, N) array, or a single (N,) signal
+    - n_h: index array shared by all filters (length M)
+    - h: (M,) shared impulse response, or a (filters, M) filter bank
+    - method: "auto", "direct" (vectorized shift-and-add), "fft", "oa",
+      "sparse" or "boxcar" (see conv_dt_numpy; for the structured methods the
+      nonzero positions are the union over all rows, and "boxcar" needs a
+      single kernel row)
+    - mode: "full", "same" or "valid" (see conv_dt_numpy)
+    - dtype: as in conv_dt_numpy
+
+    Leading dimensions broadcast like numpy arrays:
+    - (C, N) with (M,) or (1, M)  -> every channel through the same h
+    - (C, N) with (C, M)          -> channel i through filter i
+    - (N,) or (1, N) with (K, M)  -> one signal through a bank of K filters
+
+    Returns:
+    - n_y: output index array, computed once for all channels
+    - y: (channels, N + M - 1) output array (fewer columns for same/valid)
+    """
+    x, h = _check_batch_inputs(x, h, dtype)
+    y = _cached(
+        "conv_dt_batch", (x, h), (method, mode),
+        lambda: _convolve(x, h, method, _output_region(x.shape[-1], h.shape[-1], mode)),
+    )
+
+    n_y = conv_output_index_dt(n_x, n_h, mode)
+    return n_y, y
+
+
+@instrumented
+def conv_ct_batch(t, x, h, method="auto", mode="full", dtype=None):
+    """
+    Multi-channel version of conv_ct_manual.
+
+    All channels (and filters) are sampled on the same uniform grid t.
+    x and h follow the same shape/broadcasting rules as conv_dt_batch,
+    mode and dtype work like in conv_ct_manual.
+
+    Returns:
+    - t_y: output time axis, computed once for all channels
+    - y: (channels, 2 * len(t) - 1) output array, scaled by dt
+    """
+    x, h = _check_batch_inputs(x, h, dtype)
+    return _cached("conv_ct_batch", (t, x, h), (method, mode), lambda: _conv_ct(t, x, h, method, mode))
+
+
+def _check_batch_inputs(x, h, dtype=None):
+    """
+    Turn batch inputs into 2-D (rows, samples) arrays with compatible rows,
+    cast to dtype if one is given.
+    """
+    x, h = _cast_inputs(x, h, dtype)
+    if x.ndim not in (1, 2) or h.ndim not in (1, 2):
+        raise ValueError("Batch signals must be 1-D or 2-D (channels, samples) arrays.")
+    if x.shape[-1] == 0 or h.shape[-1] == 0:
+        raise ValueError("Signals must be non-empty to convolve.")
+
+    x = np.atleast_2d(x)
+    h = np.atleast_2d(h)
+    if x.shape[0] != h.shape[0] and 1 not in (x.shape[0], h.shape[0]):
+        raise ValueError(
+            f"Cannot broadcast {x.shape[0]} input channels against {h.shape[0]} filters."
+        )
+    return x, h
+
+
+
+### STREAMING CONVOLUTION
+class StreamingConvolver:
+    """
+    Overlap-save convolution for input that arrives in chunks.
+
+    Built once from a fixed h (length M). Every call to process(chunk)
+    returns exactly len(chunk) output samples, the last M - 1 input samples
+    are kept as state for the next call, and flush() returns the final
+    M - 1 samples of the full output.
+
+    Concatenating all process() outputs and flush() gives the same result
+    as conv_dt_numpy(x, h) on the whole signal (within float tolerance),
+    while memory stays at one block no matter how long the stream is.
+
+    block_size - input samples per internal FFT block (chosen from M if None);
+    short kernels skip the FFT and filter each chunk with one np.convolve
+    """
+
+    def __init__(self, h, block_size=None):
+        h = np.asarray(h)
+        if h.ndim != 1 or len(h) == 0:
+            raise ValueError("Impulse response must be a non-empty 1-D array.")
+
+        M = len(h)
+        if block_size is None:
+            nfft = _next_fast_len(8 * M)
+            block_size = nfft - M + 1
+        else:
+            block_size = int(block_size)
+            if block_size < 1:
+                raise ValueError("block_size must be a positive integer.")
+            nfft = _next_fast_len(block_size + M - 1)
+
+        self.h = h
+        self.block_size = block_size
+        self.nfft = nfft
+
+        # short kernels are cheaper to run through np.convolve per block
+        self.direct = M <= _DIRECT_MAX_SHORT
+
+        self._spectra = {}
+        self.reset()
+
+    def reset(self):
+        """
+        Forget the stream so far (state goes back to all zeros).
+        """
+        self._history = np.zeros(len(self.h) - 1, dtype=_result_dtype(self.h, self.h))
+        self.samples_in = 0
+
+    @instrumented(name="StreamingConvolver.process")
+    def process(self, chunk):
+        """
+        Feed the next input samples, get the same number of output samples.
+        """
+        chunk = np.asarray(chunk)
+        if chunk.ndim != 1:
+            raise ValueError("Stream chunks must be 1-D arrays.")
+
+        out_dtype = np.result_type(self._history, chunk)
+        if self._history.dtype != out_dtype:
+            self._history = self._history.astype(out_dtype)
+
+        if self.direct and len(chunk):
+            # np.convolve is linear in the chunk here, blocks would only add Python overhead
+            y = self._process_block(chunk).astype(out_dtype, copy=False)
+            self.samples_in += len(chunk)
+            return y
+
+        y = np.empty(len(chunk), dtype=out_dtype)
+        for start in range(0, len(chunk), self.block_size):
+            block = chunk[start:start + self.block_size]
+            y[start:start + len(block)] = self._process_block(block)
+
+        self.samples_in += len(chunk)
+        return y
+
+    def flush(self):
+        """
+        Return the last M - 1 output samples and reset for a new stream.
+        """
+        tail = self.process(np.zeros(len(self.h) - 1, dtype=self._history.dtype))
+        self.reset()
+        return tail
+
+    def _process_block(self, block):
+        M = len(self.h)
+        n = len(block)
+
+        if self.direct:
+            seg = np.concatenate((self._history, block))
+            y = np.convolve(seg, self.h, mode="valid")
+        else:
+            seg = np.zeros(self.nfft, dtype=self._history.dtype)
+            seg[:M - 1] = self._history
+            seg[M - 1:M - 1 + n] = block
+            y = self._circular_conv(seg)[M - 1:M - 1 + n]
+
+        # keep the newest M - 1 inputs for the next block
+        if M > 1:
+            if n >= M - 1:
+                self._history = block[n - (M - 1):].astype(self._history.dtype)
+            else:
+                self._history = np.concatenate((self._history[n:], block))
+
+        return y
+
+    def _circular_conv(self, seg):
+        is_complex = np.iscomplexobj(seg) or np.iscomplexobj(self.h)
+        H = self._spectra.get(is_complex)
+        if H is None:
+            fft = np.fft.fft if is_complex else np.fft.rfft
+            H = fft(self.h, self.nfft)
+            self._spectra[is_complex] = H
+
+        if is_complex:
+            return np.fft.ifft(np.fft.fft(seg) * H)
+        return np.fft.irfft(np.fft.rfft(seg) * H, self.nfft)
+
+
+def stream_convolve(chunks, h, block_size=None):
+    """
+    Generator version of StreamingConvolver.
+
+    Takes any iterable of input chunks and yields output blocks, followed by
+    the final tail of M - 1 samples once the input runs out.
+    """
+    conv = StreamingConvolver(h, block_size=block_size)
+    for chunk in chunks:
+        y = conv.process(chunk)
+        if len(y):
+            yield y
+
+    tail = conv.flush()
+    if len(tail):
+        yield tail
+
+
+### REUSABLE FILTERS
+class Filter:
+    """
+    An impulse response prepared once, then applied to many inputs.
+
+    conv_dt_numpy / conv_ct_manual work h out again on every call. A Filter
+    does that once:
+    - the structure of h (sparse taps, boxcar run) is detected when it is built
+    - the FFT of h is kept per transform size (the FILTER_SPECTRA most
+      recently used sizes), so later inputs that need the same size skip it
+      ("auto" still picks direct / fft / oa from the input length)
+    - a CT filter knows dt and where h starts in time, so outputs are scaled
+      by dt and get their time axis like conv_ct_manual
+
+    Inputs:
+    - h: 1-D impulse response (copied and kept read-only)
+    - start: axis value of h[0] (n_h[0] or t_h[0])
+    - dt: sample spacing of a CT kernel, None for a DT filter
+    - method: as in conv_dt_numpy
+    - dtype: cast h, and every input, to this dtype (None keeps them)
+
+    Filter.from_dt(n_h, h) / Filter.from_ct(t_h, h) take start and dt from the axis.
+
+    Example:
+        filt = Filter.from_ct(t, impulse_like_ct(t, width=0.02))
+        for x in signals:
+            t_y, y = filt.apply(x, axis=t, mode="same")    # = conv_ct_manual(t, x, h, mode="same")
+    """
+
+    def __init__(self, h, start=0, dt=None, method="auto", dtype=None):
+        if method not in CONV_METHODS:
+            raise ValueError(f"Unknown convolution method {method!r}, expected one of {CONV_METHODS}.")
+        dtype = None if dtype is None else resolve_dtype(dtype)
+        h = np.array(h, dtype=dtype)
+        if h.ndim != 1 or len(h) == 0:
+            raise ValueError("Impulse response must be a non-empty 1-D array.")
+        h.flags.writeable = False
+
+        self.h = h
+        self.start = start
+        self.dt = dt
+        self.method = method
+        self.dtype = dtype
+
+        kind, taps = _kernel_structure(h, None if method == "sparse" else _SPARSE_MAX_TAPS)
+        if method == "boxcar" and kind != "boxcar":
+            raise ValueError("method='boxcar' needs h to be a single run of equal nonzero samples.")
+        if method == "auto":
+            self.structure = _auto_structure(kind, taps, len(h))
+        else:
+            self.structure = method if method in ("sparse", "boxcar") else None
+        self.taps = taps
+
+        # (nfft, transform name) -> FFT of h, least recently used first
+        self._spectra = OrderedDict()
+
+    @classmethod
+    def from_dt(cls, n, h, method="auto", dtype=None):
+        """
+        DT filter h[n] on the index array n.
+        """
+        n = np.asarray(n)
+        if n.shape != np.shape(h):
+            raise ValueError("Axis and impulse response must have the same length.")
+        return cls(h, start=n[0], method=method, dtype=dtype)
+
+    @classmethod
+    def from_ct(cls, t, h, method="auto", dtype=None):
+        """
+        CT filter h(t) sampled on the uniform time axis t.
+        """
+        t = np.asarray(t)
+        if t.shape != np.shape(h) or len(t) < 2:
+            raise ValueError("A CT filter needs h sampled on at least 2 points of t.")
+        return cls(h, start=t[0], dt=t[1] - t[0], method=method, dtype=dtype)
+
+    def __len__(self):
+        return len(self.h)
+
+    def __repr__(self):
+        kind = "DT" if self.dt is None else f"CT dt={self.dt}"
+        return f"Filter(len={len(self)}, {kind}, start={self.start}, method={self.method!r}, structure={self.structure})"
+
+    @instrumented(name="Filter.apply")
+    def apply(self, x, axis=None, mode="full"):
+        """
+        Convolve one 1-D signal with h.
+
+        axis - t / n array of x; when given, (axis_y, y) is returned
+        mode - "full", "same" or "valid" as in conv_dt_numpy; for a CT
+               filter "same" gives y on the time grid of x, as in conv_ct_manual
+
+        CT outputs are scaled by dt.
+        """
+        x, h = _check_conv_inputs(x, self.h, self.dtype)
+        return self._apply(x, h, axis, mode)
+
+    @instrumented(name="Filter.apply_batch")
+    def apply_batch(self, x, axis=None, mode="full"):
+        """
+        Convolve every row of a (channels, N) array with h, same
+        options as apply (axis is the one shared by all rows).
+        """
+        x, h = _check_batch_inputs(x, self.h, self.dtype)
+        return self._apply(x, h, axis, mode)
+
+    def stream(self, block_size=None):
+        """
+        A StreamingConvolver for h (scaled by dt for a CT filter).
+        """
+        h = self.h if self.dt is None else np.multiply(self.h, self.dt, dtype=_result_dtype(self.h, self.h))
+        return StreamingConvolver(h, block_size=block_size)
+
+    def _apply(self, x, h, axis, mode):
+        N = x.shape[-1]
+        start, length = self._region(N, mode)
+        y = _convolve(x, h, self.method, (start, length), kernel=self)
+        if self.dt is not None:
+            y = np.multiply(y, self.dt, dtype=_result_dtype(x, h))
+        if axis is None:
+            return y
+        return self._output_axis(axis, N, start, length), y
+
+    def _region(self, N, mode):
+        if self.dt is not None and mode == "same":
+            # full output sample k sits at t_x[0] + t_h[0] + k*dt: start at t_x[0]
+            return int(np.floor(-self.start / self.dt + 0.5)), N
+        return _output_region(N, len(self.h), mode)
+
+    def _output_axis(self, axis, N, start, length):
+        axis = np.asarray(axis)
+        if axis.shape != (N,):
+            raise ValueError("Axis and signal must have the same length.")
+        if self.dt is None:
+            return axis[0] + self.start + start + np.arange(length)
+        if N > 1 and not np.isclose(axis[1] - axis[0], self.dt, rtol=1e-9, atol=0):
+            raise ValueError("The signal must be sampled with the filter's dt.")
+        return axis[0] + self.start + (start + np.arange(length)) * self.dt
+
+    def _method_for(self, N, dtype):
+        """
+        (method, taps) for an input of length N (used by _convolve).
+        """
+        if self.structure is not None:
+            return self.structure, self.taps
+        if self.method != "auto":
+            return self.method, None
+        return _choose_method(N, len(self.h), dtype), None
+
+    def _spectrum(self, nfft, fft):
+        key = (nfft, fft.__name__)
+        H = self._spectra.get(key)
+        if H is not None:
+            self._spectra.move_to_end(key)
+            return H
+
+        H = fft(self.h, nfft)
+        H.flags.writeable = False
+        self._spectra[key] = H
+        # the FFT size follows the input length: keep only the recent ones
+        if len(self._spectra) > FILTER_SPECTRA:
+            self._spectra.popitem(last=False)
+        return H
+
+
+### RESULT CACHE (OPT-IN)
+class ConvolutionCache:
+    """
+    LRU cache for convolution results and kernel spectra.
+
+    Keys are built from cheap array fingerprints (shape, dtype and a hash
+    of the bytes), so equal inputs hit even when they are different
+    array objects. Entries are evicted least-recently-used first once
+    there are more than max_entries of them or they hold more than
+    max_bytes in total.
+
+    Cached arrays are marked read-only: every hit returns the same array,
+    so writing into it would silently change later results.
+    """
+
+    def __init__(self, max_bytes=256 * 2**20, max_entries=256):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, value):
+        """
+        Store value (an array or tuple of arrays) and return it read-only.
+        Values bigger than max_bytes are returned without being stored.
+        """
+        arrays = value if isinstance(value, tuple) else (value,)
+        size = sum(a.nbytes for a in arrays)
+        if size > self.max_bytes:
+            return value
+
+        for a in arrays:
+            a.flags.writeable = False
+
+        if key in self._entries:
+            self.nbytes -= self._entries.pop(key)[1]
+        self._entries[key] = (value, size)
+        self.nbytes += size
+
+        while len(self._entries) > self.max_entries or self.nbytes > self.max_bytes:
+            _, (_, old_size) = self._entries.popitem(last=False)
+            self.nbytes -= old_size
+            self.evictions += 1
+        return value
+
+    def clear(self):
+        self._entries.clear()
+        self.nbytes = 0
+
+    def info(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "bytes": self.nbytes,
+            "max_bytes": self.max_bytes,
+            "max_entries": self.max_entries,
+        }
+
+
+#None = caching disabled (the default)
+_CONV_CACHE = None
+
+
+def enable_conv_cache(max_bytes=256 * 2**20, max_entries=256):
+    """
+    Turn on result caching for conv_dt_numpy, conv_ct_manual and the batch
+    functions (plus FFT spectra of kernels). Returns the cache object.
+
+    Note: while enabled these functions return read-only arrays.
+    """
+    global _CONV_CACHE
+    _CONV_CACHE = ConvolutionCache(max_bytes=max_bytes, max_entries=max_entries)
+    return _CONV_CACHE
+
+
+def disable_conv_cache():
+    global _CONV_CACHE
+    _CONV_CACHE = None
+
+
+def conv_cache_info():
+    """
+    Hit/miss/eviction counters and size of the cache (None if disabled).
+    """
+    return None if _CONV_CACHE is None else _CONV_CACHE.info()
+
+
+def array_fingerprint(a):
+    """
+    (shape, dtype, 128-bit hash of the data) of an array.
+    """
+    a = np.ascontiguousarray(a)
+    digest = hashlib.blake2b(a.data, digest_size=16).hexdigest()
+    return a.shape, a.dtype.str, digest
+
+
+def _cached(tag, arrays, params, compute):
+    """
+    compute() through the cache when it is enabled, keyed on the
+    fingerprints of arrays plus the other (hashable) params.
+    """
+    cache = _CONV_CACHE
+    if cache is None:
+        return compute()
+
+    # integer inputs give the default dtype, so it is part of the key
+    key = (tag, tuple(array_fingerprint(a) for a in arrays), params, get_default_dtype().str)
+    value = cache.get(key)
+    if value is None:
+        value = cache.put(key, compute())
+    return value
+
+
+
+
+### METHOD SELECTION + FFT HELPERS
+
+CONV_METHODS = ("auto", "direct", "fft", "oa", "sparse", "boxcar")
+CONV_MODES = ("full", "same", "valid")
+
+# below these sizes np.convolve beats the FFT (measured with numpy 2.x)
+_DIRECT_MAX_SHORT = 64
+_DIRECT_MAX_WORK = 2**18
+
+# overlap-add pays off once the long signal is this many times the short one
+_OA_MIN_RATIO = 16
+
+# FFTs of h a Filter keeps (one per transform size, least recently used dropped)
+FILTER_SPECTRA = 8
+
+# "auto" uses the sparse path for at most this many nonzero samples,
+# and only when at most 1/_SPARSE_MIN_ZEROS_RATIO of the kernel is nonzero
+_SPARSE_MAX_TAPS = 32
+_SPARSE_MIN_ZEROS_RATIO = 4
+
+
+def _check_conv_inputs(x, h, dtype=None):
+    """
+    Turn inputs into 1-D arrays (cast to dtype if one is given)
+    and reject empty signals.
+    """
+    x, h = _cast_inputs(x, h, dtype)
+    if x.ndim != 1 or h.ndim != 1:
+        raise ValueError("Signals must be 1-D arrays to convolve.")
+    if len(x) == 0 or len(h) == 0:
+        raise ValueError("Signals must be non-empty to convolve.")
+    return x, h
+
+
+def _cast_inputs(x, h, dtype=None):
+    if dtype is None:
+        return np.asarray(x), np.asarray(h)
+    dtype = resolve_dtype(dtype)
+    return np.asarray(x, dtype=dtype), np.asarray(h, dtype=dtype)
+
+
+def _choose_method(N, M, dtype):
+    """
+    Pick the cheapest convolution method for lengths N and M.
+
+    Integer inputs always go direct so the output stays exact (and integer).
+    """
+    if not np.issubdtype(dtype, np.inexact):
+        return "direct"
+
+    short = min(N, M)
+    long = max(N, M)
+    if short <= _DIRECT_MAX_SHORT or N * M <= _DIRECT_MAX_WORK:
+        return "direct"
+    if long >= _OA_MIN_RATIO * short:
+        return "oa"
+    return "fft"
+
+
+def _kernel_structure(h, max_taps=None):
+    """
+    ("boxcar" | "sparse" | None, nonzero positions) of h along the last axis.
+
+    Positions are the union over all rows of a batch. "boxcar" means a single
+    row whose nonzero samples are one contiguous run of the same value, its
+    positions are a range. With max_taps, a kernel with more nonzero samples
+    that is not a boxcar gives (None, None) without building the index array
+    (a dense signal would need 8 bytes per sample for it).
+    """
+    nonzero = h != 0
+    if h.ndim > 1:
+        nonzero = nonzero.reshape(-1, h.shape[-1]).any(axis=0)
+    count = int(np.count_nonzero(nonzero))
+
+    if count > 1 and h.size == h.shape[-1]:
+        first = int(np.argmax(nonzero))
+        last = len(nonzero) - 1 - int(np.argmax(nonzero[::-1]))
+        if last - first + 1 == count:
+            run = h.reshape(-1)[first:last + 1]
+            if np.all(run == run[0]):
+                return "boxcar", range(first, last + 1)
+    if max_taps is not None and count > max_taps:
+        return None, None
+
+    taps = np.flatnonzero(nonzero)
+    if count < h.shape[-1]:
+        return "sparse", taps
+    return None, taps
+
+
+def _choose_structured(x, h, method):
+    """
+    Method and operand order for a structure hint (or "auto").
+
+    Returns (method, x, h, taps) with the structured signal moved into h;
+    for "auto" the method is None when neither signal qualifies.
+    """
+    # "auto" and "boxcar" never need the positions of a dense signal
+    max_taps = {"auto": _SPARSE_MAX_TAPS, "boxcar": 0}.get(method)
+    candidates = []
+    for a, b in ((x, h), (h, x)):
+        kind, taps = _kernel_structure(b, max_taps)
+        candidates.append((kind, taps, a, b))
+        if method == "auto":
+            structured = _auto_structure(kind, taps, b.shape[-1])
+            if structured is not None:
+                return structured, a, b, taps
+        elif method == "boxcar" and kind == "boxcar":
+            return "boxcar", a, b, taps
+
+    if method == "auto":
+        return None, x, h, None
+    if method == "boxcar":
+        raise ValueError("method='boxcar' needs one signal to be a single run of equal nonzero samples.")
+
+    # sparse hint: loop over whichever signal has fewer nonzeros
+    _, taps, a, b = min(candidates, key=lambda c: len(c[1]))
+    return "sparse", a, b, taps
+
+
+def _auto_structure(kind, taps, M):
+    """
+    Structured method "auto" uses for a kernel of length M with these
+    nonzero taps (see _kernel_structure), None if it is not worth it.
+    """
+    if kind is None:
+        return None
+    if kind == "boxcar" and len(taps) > _SPARSE_MAX_TAPS:
+        return "boxcar"
+    if len(taps) <= _SPARSE_MAX_TAPS and _SPARSE_MIN_ZEROS_RATIO * len(taps) <= M:
+        return "sparse"
+    return None
+
+
+def _output_region(N, M, mode):
+    """
+    (start, length) of an np.convolve mode within the full N + M - 1 output.
+    """
+    short = min(N, M)
+    long = max(N, M)
+    if mode == "full":
+        return 0, N + M - 1
+    if mode == "same":
+        return (short - 1) // 2, long
+    if mode == "valid":
+        return short - 1, long - short + 1
+    raise ValueError(f"Unknown convolution mode {mode!r}, expected one of {CONV_MODES}.")
+
+
+def _convolve(x, h, method="auto", region=None, kernel=None):
+    """
+    Linear convolution with the requested method.
+
+    region = (start, length) selects y_full[start : start + length]
+    (None = full output); only that part is computed, and positions
+    outside the full output are zeros.
+
+    kernel - the Filter that h comes from: its structure and FFT spectra
+    are reused instead of being worked out from h again.
+
+    1-D x and h go through np.convolve for "direct"; already checked 2-D
+    batches (rows broadcast) use the vectorized shift-and-add instead.
+    """
+    if method not in CONV_METHODS:
+        raise ValueError(f"Unknown convolution method {method!r}, expected one of {CONV_METHODS}.")
+
+    if np.ndim(x) < 2 and np.ndim(h) < 2:
+        x, h = _check_conv_inputs(x, h)
+    N = x.shape[-1]
+    M = h.shape[-1]
+    full_length = N + M - 1
+
+    taps = None
+    spectrum = None
+    if kernel is not None:
+        method, taps = kernel._method_for(N, np.result_type(x, h))
+        spectrum = kernel._spectrum
+    elif method in ("auto", "sparse", "boxcar"):
+        structured, x, h, taps = _choose_structured(x, h, method)
+        method = structured or _choose_method(N, M, np.result_type(x, h))
+
+    start, length = (0, full_length) if region is None else region
+
+    # part of the region that lies inside the full output
+    lo = min(max(start, 0), full_length)
+    hi = max(min(start + length, full_length), lo)
+
+    if hi > lo:
+        y = _convolve_region(x, h, method, lo, hi - lo, taps, spectrum)
+        if (lo, hi) == (start, start + length):
+            return y
+    else:
+        dtype = _result_dtype(x, h) if method in ("fft", "oa") else np.result_type(x, h)
+        y = np.zeros(np.broadcast_shapes(x.shape[:-1], h.shape[:-1]) + (0,), dtype=dtype)
+
+    out = np.zeros(y.shape[:-1] + (length,), dtype=y.dtype)
+    out[..., lo - start:hi - start] = y
+    return out
+
+
+def _convolve_region(x, h, method, start, length, taps=None, spectrum=None):
+    """
+    y_full[start : start + length] (inside the full output) with one method.
+
+    taps - nonzero positions of h, for "sparse" / "boxcar"
+    spectrum - precomputed FFTs of h, for "fft" / "oa" (see _fft_pair)
+    """
+    N = x.shape[-1]
+    M = h.shape[-1]
+    full = start == 0 and length == N + M - 1
+
+    if method == "direct":
+        if x.ndim == 1 and h.ndim == 1:
+            if full:
+                return np.convolve(x, h)
+            if M > N:
+                x, h = h, x
+                N, M = M, N
+            # the outputs only need x[start - (M-1) : start + length]
+            seg = _padded_segment(x, start - (M - 1), start + length)
+            return np.convolve(seg, h, mode="valid")
+        return _conv_shift_add(x, h, start, length)
+    if method == "fft":
+        return _conv_fft(x, h, start, length, spectrum)
+    if method == "sparse":
+        return _conv_sparse(x, h, taps, start, length)
+    if method == "boxcar":
+        return _conv_boxcar(x, h, taps, start, length)
+
+    y = _conv_overlap_add(x, h, spectrum=spectrum)
+    return y if full else y[..., start:start + length]
+
+
+def _conv_sparse(x, h, taps, start=0, length=None):
+    """
+    Shift-and-add over the nonzero samples (taps) of h only: O(N * nnz).
+
+    y[n] = sum over k in taps of h[k] * x[n - k]
+    """
+    N = x.shape[-1]
+    if length is None:
+        length = N + h.shape[-1] - 1
+
+    shape = np.broadcast_shapes(x.shape[:-1], h.shape[:-1]) + (length,)
+    y = np.zeros(shape, dtype=np.result_type(x, h))
+
+    for k in taps:
+        # outputs n in [lo, hi) read x[n - k] inside 0 .. N-1
+        lo = max(start, k)
+        hi = min(start + length, N + k)
+        if hi > lo:
+            y[..., lo - start:hi - start] += h[..., k:k + 1] * x[..., lo - k:hi - k]
+
+    return y
+
+
+def _conv_boxcar(x, h, taps, start=0, length=None):
+    """
+    h is the value v on h[a : a + L] and zero elsewhere, so
+    y[n] = v * (x[n-a-L+1] + ... + x[n-a]): a moving sum, read off a single
+    cumulative sum of x as C[n-a+1] - C[n-a-L+1]. O(N + M).
+
+    The running sum is kept in float64 (int64 for integers) so long
+    float32 signals do not drift.
+    """
+    N = x.shape[-1]
+    if length is None:
+        length = N + h.shape[-1] - 1
+
+    a = int(taps[0])
+    L = len(taps)
+    v = h.reshape(-1)[a]
+
+    out_dtype = np.result_type(x, h)
+    if np.issubdtype(out_dtype, np.inexact):
+        acc_dtype = np.result_type(out_dtype, np.float64)
+    else:
+        acc_dtype = np.result_type(out_dtype, np.int64)
+
+    # C[i] = x[0] + ... + x[i-1]
+    C = np.zeros(x.shape[:-1] + (N + 1,), dtype=acc_dtype)
+    np.cumsum(x, axis=-1, dtype=acc_dtype, out=C[..., 1:])
+
+    n = np.arange(start, start + length)
+    upper = np.clip(n - a + 1, 0, N)
+    lower = np.clip(n - a - L + 1, 0, N)
+    y = (C[..., upper] - C[..., lower]) * v
+    return y.astype(out_dtype, copy=False)
+
+
+def _next_fast_len(n):
+    """
+    Smallest 2^a * 3^b * 5^c >= n (lengths numpy's FFT handles quickly).
+    """
+    if n <= 6:
+        return n
+
+    best = 1 << (n - 1).bit_length()
+    p5 = 1
+    while p5 < best:
+        p35 = p5
+        while p35 < best:
+            # smallest power of two that lifts p35 up to n
+            quotient = -(-n // p35)
+            candidate = p35 * (1 << (quotient - 1).bit_length())
+            best = min(best, candidate)
+            p35 *= 3
+        p5 *= 5
+    return best
+
+
+def _result_dtype(x, h):
+    """
+    Output dtype of an FFT convolution: float inputs keep their precision,
+    integers become the default dtype (see dtypes.py).
+    """
+    return resolve_dtype(None, x, h)
+
+
+def _fft_pair(x, h, nfft, spectrum=None):
+    """
+    Forward transforms + inverse for real or complex signals.
+
+    spectrum(nfft, fft) - returns fft(h, nfft) precomputed (Filter._spectrum),
+    None = transform h here (through the cache when it is enabled)
+    """
+    if np.iscomplexobj(x) or np.iscomplexobj(h):
+        X = np.fft.fft(x, nfft)
+        H = _kernel_spectrum(h, nfft, np.fft.fft) if spectrum is None else spectrum(nfft, np.fft.fft)
+        return np.fft.ifft(X * H, nfft)
+    X = np.fft.rfft(x, nfft)
+    H = _kernel_spectrum(h, nfft, np.fft.rfft) if spectrum is None else spectrum(nfft, np.fft.rfft)
+    return np.fft.irfft(X * H, nfft)
+
+
+def _kernel_spectrum(h, nfft, fft):
+    """
+    fft(h, nfft), reused from the cache when the same kernel and
+    transform size come back.
+    """
+    return _cached(("spectrum", fft.__name__, nfft), (h,), h.shape, lambda: fft(h, nfft))
+
+
+def _conv_fft(x, h, start=0, length=None, spectrum=None):
+    """
+    Convolution along the last axis with a single zero-padded FFT.
+
+    Returns y_full[start : start + length] (the full output by default).
+    A circular convolution of size P mixes y_full[i] with y_full[i +- P],
+    so the requested outputs come out clean as soon as
+        P >= start + length   and   P >= (N + M - 1) - start
+    which for "same"/"valid" is shorter than the full N + M - 1.
+    """
+    N = x.shape[-1]
+    M = h.shape[-1]
+    L = N + M - 1
+    if length is None:
+        length = L
+
+    nfft = _next_fast_len(max(start + length, L - start, N, M))
+    y = _fft_pair(x, h, nfft, spectrum)[..., start:start + length]
+    return y.astype(_result_dtype(x, h), copy=False)
+
+
+def _conv_overlap_add(x, h, block_size=None, spectrum=None):
+    """
+    Full convolution along the last axis with overlap-add.
+
+    All blocks are transformed in one batched FFT call, then the block
+    outputs (length block_size + M - 1) are folded back onto the output.
+    spectrum - precomputed FFTs of h (see _fft_pair)
+    """
+    # convolution is commutative: always block the longer signal
+    if h.shape[-1] > x.shape[-1]:
+        x, h = h, x
+        spectrum = None
+
+    N = x.shape[-1]
+    M = h.shape[-1]
+    L_out = N + M - 1
+
+    if block_size is None:
+        nfft = _next_fast_len(8 * M)
+        block_size = nfft - M + 1
+    else:
+        block_size = int(block_size)
+        if block_size < 1:
+            raise ValueError("block_size must be a positive integer.")
+        nfft = _next_fast_len(block_size + M - 1)
+
+    n_blocks = -(-N // block_size)
+    lead = x.shape[:-1]
+
+    x_pad = np.zeros(lead + (n_blocks * block_size,), dtype=x.dtype)
+    x_pad[..., :N] = x
+    blocks = x_pad.reshape(lead + (n_blocks, block_size))
+
+    y_blocks = _fft_pair(blocks, h[..., None, :], nfft, spectrum)[..., :block_size + M - 1]
+
+    # every block output = head (block_size samples) + tail (M - 1 samples)
+    # that spills into the next block
+    tail_len = M - 1
+    out_len = (n_blocks + -(-tail_len // block_size)) * block_size
+    y = np.zeros(y_blocks.shape[:-2] + (out_len,), dtype=y_blocks.dtype)
+
+    y[..., :n_blocks * block_size] += y_blocks[..., :block_size].reshape(y.shape[:-1] + (-1,))
 
+    start = block_size
+    while tail_len > 0:
+        # tails longer than one block are folded in block-sized pieces
+        piece = min(tail_len, block_size)
+        offset = M - 1 - tail_len
+        seg = np.zeros(y_blocks.shape[:-1] + (block_size,), dtype=y_blocks.dtype)
+        seg[..., :piece] = y_blocks[..., block_size + offset:block_size + offset + piece]
+        y[..., start:start + n_blocks * block_size] += seg.reshape(y.shape[:-1] + (-1,))
+        start += block_size
+        tail_len -= piece
 
+    return y[..., :L_out].astype(_result_dtype(x, h), copy=False)
@@ -0,0 +1,75 @@
+###DTYPE POLICY
+
+#every generator, operation and convolution function takes dtype=None.
+#the output dtype is then picked by resolve_dtype:
+#   - an explicit dtype always wins
+#   - otherwise floating inputs keep their precision (float32 in -> float32 out,
+#     nothing is silently upcast to float64)
+#   - otherwise (integer index arrays, booleans, python scalars) the global
+#     default is used, float64 unless changed with set_default_dtype
+#
+#usage:
+#   set_default_dtype(np.float32)          # for the rest of the program
+#   with default_dtype(np.float32): ...    # only inside the block
+
+from contextlib import contextmanager
+
+import numpy as np
+
+
+_DEFAULT_DTYPE = np.dtype(np.float64)
+
+
+def _check_dtype(dtype):
+    dtype = np.dtype(dtype)
+    if not np.issubdtype(dtype, np.inexact):
+        raise ValueError(f"Signal dtype must be a float or complex type, got {dtype}.")
+    return dtype
+
+
+def get_default_dtype():
+    return _DEFAULT_DTYPE
+
+
+def set_default_dtype(dtype):
+    """
+    Set the global default dtype, return the previous one.
+    """
+    global _DEFAULT_DTYPE
+    previous = _DEFAULT_DTYPE
+    _DEFAULT_DTYPE = _check_dtype(dtype)
+    return previous
+
+
+@contextmanager
+def default_dtype(dtype):
+    """
+    Use dtype as the default inside a with-block.
+    """
+    previous = set_default_dtype(dtype)
+    try:
+        yield get_default_dtype()
+    finally:
+        set_default_dtype(previous)
+
+
+def resolve_dtype(dtype=None, *inputs):
+    """
+    Output dtype for a function called with dtype and these inputs.
+
+    Only array inputs decide the precision; scalar parameters (A, f, dt...)
+    never upcast, a complex scalar only makes the result complex.
+    """
+    if dtype is not None:
+        return _check_dtype(dtype)
+
+    arrays = [a for a in inputs if isinstance(a, np.ndarray) or np.ndim(a) > 0]
+    scalars = [a for a in inputs if not (isinstance(a, np.ndarray) or np.ndim(a) > 0)]
+
+    inexact = [np.asarray(a).dtype for a in arrays]
+    inexact = [d for d in inexact if np.issubdtype(d, np.inexact)]
+    result = np.result_type(*inexact) if inexact else _DEFAULT_DTYPE
+
+    if any(np.iscomplexobj(s) for s in scalars):
+        result = np.result_type(result, 1j)
+    return result
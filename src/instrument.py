@@ -0,0 +1,227 @@
+###INSTRUMENTATION
+
+#records where a run spends time and memory.
+#   @instrumented                 on a function: every call becomes an event
+#   with span("name"): ...        any block of code becomes an event
+#an event has the wall time, the number of input samples (size of all array
+#arguments), the bytes of the arrays returned and, with memory=True, the
+#peak bytes allocated during the call (tracemalloc, slow).
+#
+#disabled (the default) a decorated function costs one flag check per call.
+#
+#usage:
+#   enable()
+#   ... run ...
+#   print_summary()
+#   dump_trace("trace.json")      # open in chrome://tracing or ui.perfetto.dev
+
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import numpy as np
+
+
+_ENABLED = False
+_MEMORY = False
+
+#finished events, Chrome trace-event format ("ph": "X" complete events)
+_EVENTS = []
+
+#tracemalloc bookkeeping for nested spans: [current bytes at start, peak seen]
+_MEM_STACK = []
+
+
+def enable(memory=False):
+    """
+    Start recording. memory=True also measures peak allocations (tracemalloc).
+    """
+    global _ENABLED, _MEMORY
+    _ENABLED = True
+    _MEMORY = memory
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable():
+    global _ENABLED, _MEMORY
+    _ENABLED = False
+    if _MEMORY and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _MEMORY = False
+
+
+def is_enabled():
+    return _ENABLED
+
+
+def settings():
+    """
+    Current settings, e.g. to pass to worker processes (see configure).
+    """
+    return {"enabled": _ENABLED, "memory": _MEMORY}
+
+
+def configure(enabled=False, memory=False):
+    if enabled:
+        enable(memory=memory)
+    else:
+        disable()
+
+
+def reset():
+    """
+    Forget every recorded event.
+    """
+    _EVENTS.clear()
+
+
+def take_events():
+    """
+    Return the recorded events and clear them (used by worker processes).
+    """
+    events = list(_EVENTS)
+    _EVENTS.clear()
+    return events
+
+
+def add_events(events):
+    """
+    Add events recorded elsewhere (e.g. returned by a worker process).
+    """
+    _EVENTS.extend(events)
+
+
+# -----------------------------
+# RECORDING
+# -----------------------------
+def _samples(values):
+    return int(sum(v.size for v in values if isinstance(v, np.ndarray)))
+
+
+def _nbytes(result):
+    if isinstance(result, np.ndarray):
+        return int(result.nbytes)
+    if isinstance(result, tuple):
+        return int(sum(r.nbytes for r in result if isinstance(r, np.ndarray)))
+    return 0
+
+
+@contextmanager
+def span(name, category="run", **args):
+    """
+    Record the block as one event. args are stored with it (must be JSON-able).
+    Does nothing while instrumentation is disabled.
+    """
+    if not _ENABLED:
+        yield args
+        return
+
+    memory = _MEMORY and tracemalloc.is_tracing()
+    if memory:
+        current, peak = tracemalloc.get_traced_memory()
+        if _MEM_STACK:
+            _MEM_STACK[-1][1] = max(_MEM_STACK[-1][1], peak)
+        tracemalloc.reset_peak()
+        _MEM_STACK.append([current, 0])
+
+    start = time.perf_counter()
+    try:
+        yield args
+    finally:
+        end = time.perf_counter()
+        if memory:
+            _, peak = tracemalloc.get_traced_memory()
+            base, seen = _MEM_STACK.pop()
+            peak = max(peak, seen)
+            if _MEM_STACK:
+                _MEM_STACK[-1][1] = max(_MEM_STACK[-1][1], peak)
+            args["peak_bytes"] = peak - base
+
+        _EVENTS.append({
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": start * 1e6,
+            "dur": (end - start) * 1e6,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": args,
+        })
+
+
+def instrumented(func=None, *, name=None):
+    """
+    Decorator: record every call of func while instrumentation is enabled.
+
+    The event is named after the function (or name) and stores the input
+    samples and returned bytes; the category is the function's module.
+    """
+    if func is None:
+        return functools.partial(instrumented, name=name)
+
+    label = name or func.__qualname__
+    category = func.__module__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _ENABLED:
+            return func(*args, **kwargs)
+        info = {"samples": _samples(args) + _samples(kwargs.values())}
+        with span(label, category, **info) as recorded:
+            result = func(*args, **kwargs)
+            recorded["bytes_out"] = _nbytes(result)
+        return result
+
+    return wrapper
+
+
+# -----------------------------
+# REPORTS
+# -----------------------------
+def summary():
+    """
+    One row per event name: calls, total / mean seconds, input samples,
+    bytes returned and the largest peak allocation. Sorted by total time.
+    """
+    rows = {}
+    for ev in _EVENTS:
+        row = rows.setdefault(ev["name"], {
+            "name": ev["name"], "category": ev["cat"], "calls": 0, "seconds": 0.0,
+            "samples": 0, "bytes_out": 0, "peak_bytes": None,
+        })
+        row["calls"] += 1
+        row["seconds"] += ev["dur"] / 1e6
+        row["samples"] += ev["args"].get("samples", 0)
+        row["bytes_out"] += ev["args"].get("bytes_out", 0)
+        if "peak_bytes" in ev["args"]:
+            row["peak_bytes"] = max(row["peak_bytes"] or 0, ev["args"]["peak_bytes"])
+
+    for row in rows.values():
+        row["mean_ms"] = 1e3 * row["seconds"] / row["calls"]
+    return sorted(rows.values(), key=lambda r: r["seconds"], reverse=True)
+
+
+def print_summary(rows=None):
+    rows = summary() if rows is None else rows
+    header = f"{'name':<28}{'calls':>7}{'total s':>10}{'mean ms':>10}{'Msamples':>10}{'out MB':>9}{'peak MB':>9}"
+    print("\n" + header)
+    print("-" * len(header))
+    for r in rows:
+        peak = "-" if r["peak_bytes"] is None else f"{r['peak_bytes'] / 2**20:.2f}"
+        print(
+            f"{r['name']:<28}{r['calls']:>7}{r['seconds']:>10.4f}{r['mean_ms']:>10.3f}"
+            f"{r['samples'] / 1e6:>10.3f}{r['bytes_out'] / 2**20:>9.2f}{peak:>9}"
+        )
+
+
+def dump_trace(path):
+    """
+    Write the events as a Chrome trace-event JSON file.
+    """
+    with open(path, "w") as f:
+        json.dump({"traceEvents": _EVENTS, "displayTimeUnit": "ms"}, f)
@@ -1,3 +1,7 @@
+import argparse
+import sys
+import time
+
 import numpy as np
 
 # Import convolution functions
@@ -11,8 +15,7 @@ from convolution import (
 from signal_operations import (
     amplitude_scale,
     time_shift_ct, time_reverse_ct,
-    shift_dt, reverse_dt,
-    add_signals, multiply_signals
+    shift_dt, reverse_dt
 )
 
 from signal_generator import (
@@ -20,30 +23,59 @@ from signal_generator import (
     unit_step_dt, ramp_dt, sin_dt, exp_decay_dt, impulse_dt
 )
 
+import instrument
+
+from signal_expr import generator, signal, evaluate
+
+from recursive_filter import FirstOrderSystem, compare_with_convolution
+
+from spectral import welch, frequency_response
+
+from parameters import PARAM_RANGES, DEFAULT_CT_POINTS, DEFAULT_DT_MAX
+
 from plot_utils import (
-    set_plot_style, plot_ct_signal, plot_dt_signal, plot_ct_dt_comparison
+    set_plot_style, plot_ct_signal, plot_dt_signal, plot_ct_dt_comparison,
+    plot_dt_overlay, plot_ct_overlay, RenderQueue, configure_plot_cache
 )
 
 
-def main():
-    set_plot_style()
+#the pipeline is split into stages that share one context dict (ctx).
+#each stage lists the stages it needs, those are run first automatically:
+#   python main.py --stages validate --no-plots     (generate, dt_conv, ct_conv, validate)
+STAGE_ORDER = ["generate", "operations", "dt_conv", "ct_conv", "validate", "spectral", "plot"]
 
-    # RANDOMIZATION SETUP
-    seed = None
-    rng = np.random.default_rng(seed)
+
+def _draw(ctx, name):
+    value = ctx["rng"].uniform(*PARAM_RANGES[name])
+    return ctx["overrides"].get(name, value)
+
+
+def _plot(ctx, plot_func, *args, **kwargs):
+    """
+    Queue a plot if plotting is on (the render starts right away in a worker).
+    """
+    if ctx["plots"] is not None:
+        ctx["plots"].submit(plot_func, *args, **kwargs)
+
+
+# ============================================================
+# STAGE: GENERATE
+# ============================================================
+def stage_generate(ctx):
+    rng = ctx["rng"]
 
     # ============================================================
     # CONTINUOUS-TIME (CT) SETUP
     # ============================================================
-    t = np.linspace(-1, 1, 2000)
+    t = np.linspace(-1, 1, ctx["ct_points"])
 
     # RANDOM CT PARAMETERS
-    A_ct = rng.uniform(0.5, 2.0)
-    f_ct = rng.uniform(2.0, 10.0)
-    phase_ct = rng.uniform(0.0, 2*np.pi)
-    a_ct = rng.uniform(0.5, 5.0)
-    width_imp_ct = rng.uniform(0.005, 0.05)
-    noise_std_ct = rng.uniform(0.0, 0.05)
+    A_ct = _draw(ctx, "A_ct")
+    f_ct = _draw(ctx, "f_ct")
+    phase_ct = _draw(ctx, "phase_ct")
+    a_ct = _draw(ctx, "a_ct")
+    width_imp_ct = _draw(ctx, "width_imp_ct")
+    noise_std_ct = _draw(ctx, "noise_std_ct")
 
     print("\n================ RANDOM CT PARAMETERS ================")
     print(f"A_ct = {A_ct:.3f}")
@@ -70,25 +102,22 @@ def main():
     noise_ct = noise_std_ct * rng.standard_normal(len(t))
     s_ct = s_ct + noise_ct
 
-    # ============================================================
-    # PLOT AND SAVE CT SIGNALS
-    # ============================================================
-    plot_ct_signal(t, u_ct, "CT Unit Step u(t)", "ct_unit_step.png")
-    plot_ct_signal(t, r_ct, "CT Ramp r(t)", "ct_ramp.png")
-    plot_ct_signal(t, s_ct, "CT Sine Wave x(t) = sin(2πft) (RANDOM)", "ct_sine.png")
-    plot_ct_signal(t, e_ct, "CT Exponential Decay x(t) = e^(-at)u(t) (RANDOM)", "ct_exp_decay.png")
-    plot_ct_signal(t, imp_ct, "CT Impulse-like Approximation (RANDOM)", "ct_impulse_like.png")
+    _plot(ctx, plot_ct_signal, t, u_ct, "CT Unit Step u(t)", "ct_unit_step.png")
+    _plot(ctx, plot_ct_signal, t, r_ct, "CT Ramp r(t)", "ct_ramp.png")
+    _plot(ctx, plot_ct_signal, t, s_ct, "CT Sine Wave x(t) = sin(2πft) (RANDOM)", "ct_sine.png")
+    _plot(ctx, plot_ct_signal, t, e_ct, "CT Exponential Decay x(t) = e^(-at)u(t) (RANDOM)", "ct_exp_decay.png")
+    _plot(ctx, plot_ct_signal, t, imp_ct, "CT Impulse-like Approximation (RANDOM)", "ct_impulse_like.png")
 
     # ============================================================
     # DISCRETE-TIME (DT) SETUP
     # ============================================================
-    n = np.arange(-20, 21, 1)
+    n = np.arange(-ctx["dt_max"], ctx["dt_max"] + 1, 1)
 
     # RANDOM DT PARAMETERS
-    A_dt = rng.uniform(0.5, 2.0)
-    f_dt = rng.uniform(0.05, 0.45)   # cycles/sample
-    phase_dt = rng.uniform(0.0, 2*np.pi)
-    a_dt = rng.uniform(0.7, 0.99)
+    A_dt = _draw(ctx, "A_dt")
+    f_dt = _draw(ctx, "f_dt")
+    phase_dt = _draw(ctx, "phase_dt")
+    a_dt = _draw(ctx, "a_dt")
 
     print("\n================ RANDOM DT PARAMETERS =================")
     print(f"A_dt = {A_dt:.3f}")
@@ -108,80 +137,123 @@ def main():
 
     imp_dt = impulse_dt(n)
 
-    # ============================================================
-    # PLOT AND SAVE DT SIGNALS
-    # ============================================================
-    plot_dt_signal(n, u_dt, "DT Unit Step u[n]", "dt_unit_step.png")
-    plot_dt_signal(n, r_dt, "DT Ramp r[n]", "dt_ramp.png")
-    plot_dt_signal(n, s_dt, "DT Sine Sequence x[n] = sin(2πfn) (RANDOM)", "dt_sine.png")
-    plot_dt_signal(n, e_dt, "DT Exponential Decay x[n] = a^n u[n] (RANDOM)", "dt_exp_decay.png")
-    plot_dt_signal(n, imp_dt, "DT Impulse δ[n]", "dt_impulse.png")
+    _plot(ctx, plot_dt_signal, n, u_dt, "DT Unit Step u[n]", "dt_unit_step.png")
+    _plot(ctx, plot_dt_signal, n, r_dt, "DT Ramp r[n]", "dt_ramp.png")
+    _plot(ctx, plot_dt_signal, n, s_dt, "DT Sine Sequence x[n] = sin(2πfn) (RANDOM)", "dt_sine.png")
+    _plot(ctx, plot_dt_signal, n, e_dt, "DT Exponential Decay x[n] = a^n u[n] (RANDOM)", "dt_exp_decay.png")
+    _plot(ctx, plot_dt_signal, n, imp_dt, "DT Impulse δ[n]", "dt_impulse.png")
 
     # ============================================================
     # CT vs DT COMPARISON PLOTS
     # ============================================================
-    plot_ct_dt_comparison(
-        t, u_ct,
-        n, u_dt,
-        "Unit Step: Continuous vs Discrete",
-        "compare_step.png"
-    )
+    _plot(ctx, plot_ct_dt_comparison, t, u_ct, n, u_dt, "Unit Step: Continuous vs Discrete", "compare_step.png")
+    _plot(ctx, plot_ct_dt_comparison, t, r_ct, n, r_dt, "Ramp: Continuous vs Discrete", "compare_ramp.png")
 
-    plot_ct_dt_comparison(
-        t, r_ct,
-        n, r_dt,
-        "Ramp: Continuous vs Discrete",
-        "compare_ramp.png"
+    ctx.update(
+        t=t, s_ct=s_ct, imp_ct=imp_ct, f_ct=f_ct,
+        n=n, s_dt=s_dt, imp_dt=imp_dt, a_dt=a_dt,
     )
 
-    # ============================================================
-    # SIGNAL OPERATIONS (CT + DT)
-    # ============================================================
+
+# ============================================================
+# STAGE: SIGNAL OPERATIONS (CT + DT)
+# ============================================================
+def stage_operations(ctx):
+    t, s_ct = ctx["t"], ctx["s_ct"]
+    n, s_dt = ctx["n"], ctx["s_dt"]
 
     # CT sine operations
     s_ct_scaled = amplitude_scale(s_ct, scale=2)
     t_s_ct_signal, s_ct_shifted = time_shift_ct(t, s_ct, shift=0.2)
     t_s_ct_reversed, s_ct_reversed = time_reverse_ct(t, s_ct)
 
-    plot_ct_signal(t, s_ct, "CT Sine (random original)", "ct_sine_original.png", folder="plots/operations/ct")
-    plot_ct_signal(t, s_ct_scaled, "CT Sine (random scaled)", "ct_sine_scaled.png", folder="plots/operations/ct")
-    plot_ct_signal(t_s_ct_signal, s_ct_shifted, "CT Sine (random shifted)", "ct_sine_shifted.png", folder="plots/operations/ct")
-    plot_ct_signal(t_s_ct_reversed, s_ct_reversed, "CT Sine (random reversed)", "ct_sine_reversed.png", folder="plots/operations/ct")
+    _plot(ctx, plot_ct_signal, t, s_ct, "CT Sine (random original)", "ct_sine_original.png", folder="plots/operations/ct")
+    _plot(ctx, plot_ct_signal, t, s_ct_scaled, "CT Sine (random scaled)", "ct_sine_scaled.png", folder="plots/operations/ct")
+    _plot(ctx, plot_ct_signal, t_s_ct_signal, s_ct_shifted, "CT Sine (random shifted)", "ct_sine_shifted.png", folder="plots/operations/ct")
+    _plot(ctx, plot_ct_signal, t_s_ct_reversed, s_ct_reversed, "CT Sine (random reversed)", "ct_sine_reversed.png", folder="plots/operations/ct")
 
     # DT sine operations
     s_dt_scaled = amplitude_scale(s_dt, scale=2)
     n_s_dt_signal, s_dt_shifted = shift_dt(n, s_dt, shift=3)
     n_s_dt_reversed, s_dt_reversed = reverse_dt(n, s_dt)
 
-    plot_dt_signal(n, s_dt, "DT Sine (random original)", "dt_sine_original.png", folder="plots/operations/dt")
-    plot_dt_signal(n, s_dt_scaled, "DT Sine (random scaled)", "dt_sine_scaled.png", folder="plots/operations/dt")
-    plot_dt_signal(n_s_dt_signal, s_dt_shifted, "DT Sine (random shifted)", "dt_sine_shifted.png", folder="plots/operations/dt")
-    plot_dt_signal(n_s_dt_reversed, s_dt_reversed, "DT Sine (random reversed)", "dt_sine_reversed.png", folder="plots/operations/dt")
+    _plot(ctx, plot_dt_signal, n, s_dt, "DT Sine (random original)", "dt_sine_original.png", folder="plots/operations/dt")
+    _plot(ctx, plot_dt_signal, n, s_dt_scaled, "DT Sine (random scaled)", "dt_sine_scaled.png", folder="plots/operations/dt")
+    _plot(ctx, plot_dt_signal, n_s_dt_signal, s_dt_shifted, "DT Sine (random shifted)", "dt_sine_shifted.png", folder="plots/operations/dt")
+    _plot(ctx, plot_dt_signal, n_s_dt_reversed, s_dt_reversed, "DT Sine (random reversed)", "dt_sine_reversed.png", folder="plots/operations/dt")
 
     # ADD/MULTIPLY operations
-    s_plus_u_ct = add_signals(s_ct, u_ct)
-    s_mult_u_ct = multiply_signals(s_ct, u_ct)
+    # built lazily and evaluated in one chunked pass, the unit step they
+    # share is generated once per chunk instead of read from a full array
+    s_expr_ct = signal(s_ct)
+    u_expr_ct = generator("unit_step_ct")
+    s_plus_u_ct, s_mult_u_ct = evaluate([s_expr_ct + u_expr_ct, s_expr_ct * u_expr_ct], t)
 
-    plot_ct_signal(t, s_plus_u_ct, "CT Sine + Unit Step (random)", "ct_sine_plus_step.png", folder="plots/operations/ct")
-    plot_ct_signal(t, s_mult_u_ct, "CT Sine * Unit Step (random)", "ct_sine_mult_step.png", folder="plots/operations/ct")
+    _plot(ctx, plot_ct_signal, t, s_plus_u_ct, "CT Sine + Unit Step (random)", "ct_sine_plus_step.png", folder="plots/operations/ct")
+    _plot(ctx, plot_ct_signal, t, s_mult_u_ct, "CT Sine * Unit Step (random)", "ct_sine_mult_step.png", folder="plots/operations/ct")
 
-    s_plus_u_dt = add_signals(s_dt, u_dt)
-    s_mult_u_dt = multiply_signals(s_dt, u_dt)
+    s_expr_dt = signal(s_dt)
+    u_expr_dt = generator("unit_step_dt")
+    s_plus_u_dt, s_mult_u_dt = evaluate([s_expr_dt + u_expr_dt, s_expr_dt * u_expr_dt], n)
 
-    plot_dt_signal(n, s_plus_u_dt, "DT Sine + Unit Step (random)", "dt_sine_plus_step.png", folder="plots/operations/dt")
-    plot_dt_signal(n, s_mult_u_dt, "DT Sine * Unit Step (random)", "dt_sine_mult_step.png", folder="plots/operations/dt")
+    _plot(ctx, plot_dt_signal, n, s_plus_u_dt, "DT Sine + Unit Step (random)", "dt_sine_plus_step.png", folder="plots/operations/dt")
+    _plot(ctx, plot_dt_signal, n, s_mult_u_dt, "DT Sine * Unit Step (random)", "dt_sine_mult_step.png", folder="plots/operations/dt")
 
-    # ============================================================
-    # CONVOLUTION (DT)
-    # ============================================================
 
-    x_dt = s_dt
-    h_dt = imp_dt
+# ============================================================
+# STAGE: CONVOLUTION (DT)
+# ============================================================
+def stage_dt_conv(ctx):
+    n = ctx["n"]
+    x_dt = ctx["s_dt"]
+    h_dt = ctx["imp_dt"]
 
     n_y = conv_output_index_dt(n, n)
     y_dt_manual = conv_dt_manual(x_dt, h_dt)
-    y_dt_np = conv_dt_numpy(x_dt, h_dt)
+    # direct: the reference must really be np.convolve ("auto" would take the
+    # same shift-and-add route as conv_dt_manual for the sparse impulse)
+    y_dt_np = conv_dt_numpy(x_dt, h_dt, method="direct")
+
+    _plot(ctx, plot_dt_signal, n, x_dt, "DT Input x[n] (random sine)", "conv_dt_x.png", folder="plots/convolution")
+    _plot(ctx, plot_dt_signal, n, h_dt, "DT System h[n] (impulse)", "conv_dt_h.png", folder="plots/convolution")
+    _plot(ctx, plot_dt_signal, n_y, y_dt_manual, "DT Output y[n] (Manual Convolution)", "conv_dt_y_manual.png", folder="plots/convolution")
+    _plot(ctx, plot_dt_signal, n_y, y_dt_np, "DT Output y[n] (NumPy Convolution)", "conv_dt_y_numpy.png", folder="plots/convolution")
+
+    ctx.update(n_y=n_y, y_dt_manual=y_dt_manual, y_dt_np=y_dt_np)
+
+
+# ============================================================
+# STAGE: CONVOLUTION (CT)
+# ============================================================
+def stage_ct_conv(ctx):
+    t = ctx["t"]
+    x_ct = ctx["s_ct"]
+    h_ct = ctx["imp_ct"]
+
+    t_y_ct, y_ct = conv_ct_manual(t, x_ct, h_ct)
+
+    _plot(ctx, plot_ct_signal, t, x_ct, "CT Input x(t) (random sine)", "conv_ct_x.png", folder="plots/convolution")
+    _plot(ctx, plot_ct_signal, t, h_ct, "CT System h(t) (impulse-like random)", "conv_ct_h.png", folder="plots/convolution")
+    _plot(ctx, plot_ct_signal, t_y_ct, y_ct, "CT Output y(t) = x(t) * h(t)", "conv_ct_y.png", folder="plots/convolution")
 
+    # "same" output is y(t) on the grid of x(t): no cropping / interpolation
+    t_y_same_ct, y_same_ct = conv_ct_manual(t, x_ct, h_ct, mode="same")
+
+    ctx.update(t_y_same_ct=t_y_same_ct, y_same_ct=y_same_ct)
+
+
+# ============================================================
+# STAGE: VALIDATION
+# ============================================================
+def stage_validate(ctx):
+    n, x_dt = ctx["n"], ctx["s_dt"]
+    n_y, y_dt_manual, y_dt_np = ctx["n_y"], ctx["y_dt_manual"], ctx["y_dt_np"]
+    t, x_ct = ctx["t"], ctx["s_ct"]
+    t_y_same_ct, y_same_ct = ctx["t_y_same_ct"], ctx["y_same_ct"]
+
+    # ============================================================
+    # DT CONVOLUTION: manual ≈ numpy
+    # ============================================================
     dt_error = y_dt_manual - y_dt_np
     dt_max_error = np.max(np.abs(dt_error))
     dt_rmse = np.sqrt(np.mean(dt_error**2))
@@ -192,16 +264,10 @@ def main():
     print(f"RMSE: {dt_rmse:.12f}")
     print("=======================================================\n")
 
-    plot_dt_signal(n, x_dt, "DT Input x[n] (random sine)", "conv_dt_x.png", folder="plots/convolution")
-    plot_dt_signal(n, h_dt, "DT System h[n] (impulse)", "conv_dt_h.png", folder="plots/convolution")
-    plot_dt_signal(n_y, y_dt_manual, "DT Output y[n] (Manual Convolution)", "conv_dt_y_manual.png", folder="plots/convolution")
-    plot_dt_signal(n_y, y_dt_np, "DT Output y[n] (NumPy Convolution)", "conv_dt_y_numpy.png", folder="plots/convolution")
-
     # ============================================================
     # DT IMPULSE PROPERTY VALIDATION
     # x[n] * δ[n] = x[n]
     # ============================================================
-
     mask_dt = (n_y >= n[0]) & (n_y <= n[-1])
     n_y_crop = n_y[mask_dt]
     y_crop = y_dt_manual[mask_dt]
@@ -220,91 +286,32 @@ def main():
         print("\nDT impulse validation skipped: length mismatch.")
         print(f"len(y_crop)={len(y_crop)}, len(x_dt)={len(x_dt)}\n")
 
-    import matplotlib.pyplot as plt
-    import os
-
-    os.makedirs("plots/convolution", exist_ok=True)
-
-    plt.figure(figsize=(10, 5))
-    plt.stem(n, x_dt, label="x[n] input")
-    plt.stem(n_y_crop, y_crop, label="y[n] = x*δ (manual)")
-    plt.title("DT Impulse Property Validation: x[n] vs y[n]")
-    plt.xlabel("n")
-    plt.ylabel("Amplitude")
-    plt.grid(True)
-    plt.legend()
-    plt.tight_layout()
-    plt.savefig("plots/convolution/dt_impulse_property_overlay.png", dpi=300)
-    plt.close()
-
-
+    _plot(
+        ctx, plot_dt_overlay,
+        n, x_dt, "x[n] input",
+        n_y_crop, y_crop, "y[n] = x*δ (manual)",
+        "DT Impulse Property Validation: x[n] vs y[n]",
+        "dt_impulse_property_overlay.png"
+    )
 
     # ============================================================
-    # CONVOLUTION (CT)
+    # RECURSIVE FILTER VALIDATION
+    # x[n] * (a^n u[n]) = recursion y[n] = a*y[n-1] + x[n]
     # ============================================================
+    a_dt = ctx["a_dt"]
+    exp_system = FirstOrderSystem.from_exp_decay_dt(a_dt)
+    rec_max_error = compare_with_convolution(x_dt, exp_system)
 
-    x_ct = s_ct
-    h_ct = imp_ct
-
-    t_y_ct, y_ct = conv_ct_manual(t, x_ct, h_ct)
-
-    plot_ct_signal(t, x_ct, "CT Input x(t) (random sine)", "conv_ct_x.png", folder="plots/convolution")
-    plot_ct_signal(t, h_ct, "CT System h(t) (impulse-like random)", "conv_ct_h.png", folder="plots/convolution")
-    plot_ct_signal(t_y_ct, y_ct, "CT Output y(t) = x(t) * h(t)", "conv_ct_y.png", folder="plots/convolution")
-
-    t_y_ct, y_ct = conv_ct_manual(t, x_ct, h_ct)
-
-    mask_ct = (t_y_ct >= t[0]) & (t_y_ct <= t[-1])
-    t_y_crop_ct = t_y_ct[mask_ct]
-    y_crop_ct = y_ct[mask_ct]
-
-    y_interp_ct = np.interp(t, t_y_crop_ct, y_crop_ct)
-
-    ct_error = x_ct - y_interp_ct
-    ct_max_error = np.max(np.abs(ct_error))
-    ct_rmse = np.sqrt(np.mean(ct_error**2))
-
-    print("\n============== CT Convolution Validation ==============")
-    print("Property tested: x(t) * δ(t) ≈ x(t)")
-    print(f"Max absolute error: {ct_max_error:.6f}")
-    print(f"RMSE: {ct_rmse:.6f}")
+    print("\n========== Recursive Filter vs Convolution ============")
+    print(f"Property tested: x[n] * exp_decay_dt(n, {a_dt:.3f}) = one-pole recursion")
+    print(f"Max absolute error: {rec_max_error:.12f}")
     print("=======================================================\n")
 
-    # Save input + aligned output plots
-    plot_ct_signal(t, x_ct, "CT Validation Input x(t)", "ct_validation_input.png", folder="plots/convolution")
-    plot_ct_signal(t, y_interp_ct, "CT Validation Output y(t) aligned", "ct_validation_output_aligned.png", folder="plots/convolution")
-
-    # Save overlay plot
-    import matplotlib.pyplot as plt
-    import os
-
-    os.makedirs("plots/convolution", exist_ok=True)
-
-    plt.figure(figsize=(12, 6))
-    plt.plot(t, x_ct, label="x(t) input")
-    plt.plot(t, y_interp_ct, "--", label="y(t) = x*h (aligned)")
-    plt.title("CT Validation: x(t) vs y(t) (Impulse-like Convolution)")
-    plt.xlabel("Time (t)")
-    plt.ylabel("Amplitude")
-    plt.grid(True)
-    plt.legend()
-    plt.tight_layout()
-    plt.savefig("plots/convolution/ct_validation_overlay.png", dpi=300)
-    plt.close()
-
-
     # ============================================================
     # CT IMPULSE PROPERTY VALIDATION
     # x(t) * δ(t) ≈ x(t)
     # ============================================================
-
-    mask_ct = (t_y_ct >= t[0]) & (t_y_ct <= t[-1])
-    t_y_crop_ct = t_y_ct[mask_ct]
-    y_crop_ct = y_ct[mask_ct]
-
-    y_interp_ct = np.interp(t, t_y_crop_ct, y_crop_ct)
-
-    ct_error = x_ct - y_interp_ct
+    ct_error = x_ct - y_same_ct
     ct_max_error = np.max(np.abs(ct_error))
     ct_rmse = np.sqrt(np.mean(ct_error**2))
 
@@ -314,23 +321,30 @@ def main():
     print(f"RMSE: {ct_rmse:.6f}")
     print("=======================================================\n")
 
-# ============================================================
-# CT IMPULSE WIDTH VALIDATION (ONLY 1 RANDOM WIDTH)
-# ============================================================
+    # Save input + aligned output plots
+    _plot(ctx, plot_ct_signal, t, x_ct, "CT Validation Input x(t)", "ct_validation_input.png", folder="plots/convolution")
+    _plot(ctx, plot_ct_signal, t_y_same_ct, y_same_ct, "CT Validation Output y(t) aligned", "ct_validation_output_aligned.png", folder="plots/convolution")
+
+    # Save overlay plot
+    _plot(
+        ctx, plot_ct_overlay,
+        t, x_ct, "x(t) input",
+        t_y_same_ct, y_same_ct, "y(t) = x*h (aligned)",
+        "CT Validation: x(t) vs y(t) (Impulse-like Convolution)",
+        "ct_validation_overlay.png"
+    )
 
+    # ============================================================
+    # CT IMPULSE WIDTH VALIDATION (ONLY 1 RANDOM WIDTH)
+    # ============================================================
     print("\n============== CT IMPULSE WIDTH VALIDATION ============")
 
-    width = rng.uniform(0.005, 0.05)   
+    width = _draw(ctx, "width_test")
 
     h_ct_test = impulse_like_ct(t, width=width)
-    t_y_ct_test, y_ct_test = conv_ct_manual(t, x_ct, h_ct_test)
+    t_y_ct_test, y_ct_test = conv_ct_manual(t, x_ct, h_ct_test, mode="same")
 
-    mask_test = (t_y_ct_test >= t[0]) & (t_y_ct_test <= t[-1])
-    t_y_crop_test = t_y_ct_test[mask_test]
-    y_crop_test = y_ct_test[mask_test]
-    y_interp_test = np.interp(t, t_y_crop_test, y_crop_test)
-
-    error_test = x_ct - y_interp_test
+    error_test = x_ct - y_ct_test
     max_error_test = np.max(np.abs(error_test))
     rmse_test = np.sqrt(np.mean(error_test**2))
 
@@ -340,21 +354,182 @@ def main():
     print(f"RMSE: {rmse_test:.6f}")
     print("=======================================================\n")
 
-    os.makedirs("plots/convolution", exist_ok=True)
+    _plot(
+        ctx, plot_ct_overlay,
+        t, x_ct, "x(t) input",
+        t_y_ct_test, y_ct_test, f"y(t) width={width:.4f}",
+        "CT Random Width Validation: x(t) vs y(t)",
+        "ct_width_random_overlay.png"
+    )
+
+
+# ============================================================
+# STAGE: SPECTRAL CHECKS
+# ============================================================
+def stage_spectral(ctx):
+    t, x_ct, h_ct = ctx["t"], ctx["s_ct"], ctx["imp_ct"]
+
+    # noisy sine: the PSD peak should sit at f_ct
+    # (one Hann segment over all of t, zero-padded for a fine frequency grid)
+    f_psd, psd = welch(t, x_ct, nperseg=len(t), nfft=16 * len(t))
+    f_peak = f_psd[np.argmax(psd)]
+
+    # impulse-like kernel: H(0) = area ≈ 1, flat (|H| > 1/√2) up to f_3db
+    f_h, H = frequency_response(t, h_ct)
+    below = np.nonzero(np.abs(H) < np.abs(H[0]) / np.sqrt(2))[0]
+    f_3db = f_h[below[0]] if len(below) else np.inf
+
+    print("\n================== Spectral Checks ====================")
+    print(f"PSD peak of the noisy CT sine: {f_peak:.3f} Hz (f_ct = {ctx['f_ct']:.3f} Hz)")
+    print(f"Impulse-like kernel: |H(0)| = {abs(H[0]):.6f}, -3 dB at {f_3db:.1f} Hz")
+    print("=======================================================\n")
+
+
+# ============================================================
+# STAGE: PLOT
+# ============================================================
+def stage_plot(ctx):
+    # plots were queued by the other stages and render in the background,
+    # this is the barrier: wait for every queued plot and report failed files
+    if ctx["plots"] is not None:
+        ctx["plots"].wait()
+
+
+#name -> (stage function, stages it needs)
+STAGES = {
+    "generate": (stage_generate, ()),
+    "operations": (stage_operations, ("generate",)),
+    "dt_conv": (stage_dt_conv, ("generate",)),
+    "ct_conv": (stage_ct_conv, ("generate",)),
+    "validate": (stage_validate, ("dt_conv", "ct_conv")),
+    "spectral": (stage_spectral, ("generate",)),
+    "plot": (stage_plot, ()),
+}
+
+
+def resolve_stages(requested):
+    """
+    Requested stages plus everything they need, in pipeline order.
+    """
+    needed = set()
+    todo = list(requested)
+    while todo:
+        name = todo.pop()
+        if name not in STAGES:
+            raise ValueError(f"Unknown stage {name!r}, expected one of {STAGE_ORDER}.")
+        if name not in needed:
+            needed.add(name)
+            todo.extend(STAGES[name][1])
+    return [name for name in STAGE_ORDER if name in needed]
+
+
+def run(stages=None, seed=None, ct_points=DEFAULT_CT_POINTS, dt_max=DEFAULT_DT_MAX,
+        overrides=None, plots=True, force_plots=False):
+    """
+    Run the requested stages (all by default) and return (ctx, timings).
+
+    Inputs:
+    - stages: stage names, missing dependencies are added
+    - seed: rng seed (None = a different random run every time)
+    - ct_points: number of samples of t in [-1, 1]
+    - dt_max: n runs from -dt_max to dt_max
+    - overrides: {parameter name: value} replacing random draws (PARAM_RANGES)
+    - plots: False = headless, nothing is rendered
+    - force_plots: re-render plots even if the cached version is up to date
+
+    timings is a list of (stage, seconds) in run order.
+    """
+    overrides = dict(overrides or {})
+    unknown = set(overrides) - set(PARAM_RANGES)
+    if unknown:
+        raise ValueError(f"Unknown parameter(s) {sorted(unknown)}, expected some of {list(PARAM_RANGES)}.")
+
+    order = resolve_stages(stages or STAGE_ORDER)
+    plots = plots and "plot" in order
+
+    ctx = {
+        "rng": np.random.default_rng(seed),
+        "overrides": overrides,
+        "ct_points": ct_points,
+        "dt_max": dt_max,
+        "plots": None,
+    }
+    if plots:
+        set_plot_style()
+        # unchanged figures are skipped unless regeneration is forced
+        configure_plot_cache(force=force_plots)
+        # plots render in worker processes while the numeric work continues
+        ctx["plots"] = RenderQueue()
+
+    timings = []
+    for name in order:
+        start = time.perf_counter()
+        with instrument.span(name, "stage"):
+            STAGES[name][0](ctx)
+        timings.append((name, time.perf_counter() - start))
+
+    return ctx, timings
+
+
+def print_timings(timings):
+    print("\n==================== STAGE TIMES ======================")
+    for name, seconds in timings:
+        print(f"{name:<12}{seconds:>10.3f} s")
+    print(f"{'total':<12}{sum(s for _, s in timings):>10.3f} s")
+    print("=======================================================")
 
-    plt.figure(figsize=(12, 6))
-    plt.plot(t, x_ct, label="x(t) input")
-    plt.plot(t, y_interp_test, "--", label=f"y(t) width={width:.4f}")
-    plt.title("CT Random Width Validation: x(t) vs y(t)")
-    plt.xlabel("Time (t)")
-    plt.ylabel("Amplitude")
-    plt.grid(True)
-    plt.legend()
-    plt.tight_layout()
-    plt.savefig("plots/convolution/ct_width_random_overlay.png", dpi=300)
-    plt.close()
 
+def _parse_override(text):
+    name, sep, value = text.partition("=")
+    if not sep:
+        raise argparse.ArgumentTypeError(f"expected NAME=VALUE, got {text!r}")
+    try:
+        return name.strip(), float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{name} must be a number, got {value!r}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Signal analyzer: generate, operate on and convolve CT/DT signals.")
+    parser.add_argument("--stages", nargs="+", choices=STAGE_ORDER, default=STAGE_ORDER,
+                        help="stages to run (their dependencies are added), default: all")
+    parser.add_argument("--seed", type=int, default=None, help="rng seed (default: random)")
+    parser.add_argument("--ct-points", type=int, default=DEFAULT_CT_POINTS,
+                        help="samples of t in [-1, 1] (odd keeps t = 0 on the grid)")
+    parser.add_argument("--dt-max", type=int, default=DEFAULT_DT_MAX, help="n runs from -DT_MAX to DT_MAX")
+    parser.add_argument("--set", dest="overrides", action="append", default=[], type=_parse_override,
+                        metavar="NAME=VALUE", help=f"fix a random parameter, one of: {', '.join(PARAM_RANGES)}")
+    parser.add_argument("--no-plots", action="store_true", help="headless run, render nothing")
+    parser.add_argument("--force-plots", action="store_true",
+                        help="re-render every plot even if its cached version is up to date")
+    parser.add_argument("--profile", action="store_true",
+                        help="print calls, time and sizes per instrumented function at the end")
+    parser.add_argument("--profile-memory", action="store_true",
+                        help="like --profile, plus peak allocations per function (slower)")
+    parser.add_argument("--trace", metavar="PATH", default=None,
+                        help="write a Chrome trace-event JSON of the run (implies --profile)")
+    args = parser.parse_args(argv)
+
+    profile = args.profile or args.profile_memory or args.trace is not None
+    if profile:
+        instrument.enable(memory=args.profile_memory)
+
+    try:
+        _, timings = run(
+            stages=args.stages, seed=args.seed, ct_points=args.ct_points, dt_max=args.dt_max,
+            overrides=dict(args.overrides), plots=not args.no_plots, force_plots=args.force_plots,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
+    print_timings(timings)
+    if profile:
+        instrument.print_summary()
+    if args.trace is not None:
+        instrument.dump_trace(args.trace)
+        print(f"Trace written to {args.trace}")
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
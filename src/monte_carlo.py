@@ -0,0 +1,230 @@
+###MONTE CARLO VALIDATION OF THE IMPULSE PROPERTY
+#main.py checks x * δ ≈ x for a single random sine and impulse width.
+#this module repeats that check for N random parameter sets and reports
+#error statistics per impulse-width bucket.
+#
+#- every trial gets its own RNG stream (SeedSequence.spawn), so results do
+#  not depend on how trials are spread over worker processes
+#- the time grid t and index grid n are put in shared memory once and
+#  mapped read-only by every worker
+#
+#usage (from src/):
+#   python monte_carlo.py --trials 2000 --seed 0 --workers 4 --out mc.json
+
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from convolution import conv_ct_manual, conv_dt_manual
+from signal_generator import sin_ct, impulse_like_ct, sin_dt, impulse_dt
+from parameters import PARAM_RANGES, DEFAULT_CT_POINTS, DEFAULT_DT_MAX
+
+
+#the ranges main.py draws from (parameters.py), for the parameters a trial uses
+TRIAL_PARAMETERS = ["A_ct", "f_ct", "phase_ct", "noise_std_ct", "width_imp_ct", "A_dt", "f_dt", "phase_dt"]
+DEFAULT_RANGES = {name: PARAM_RANGES[name] for name in TRIAL_PARAMETERS}
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+# -----------------------------
+# SHARED GRIDS
+# -----------------------------
+#set in every worker by _attach_grids (or directly when running in-process)
+_GRIDS = {}
+_SHARED = []
+
+
+def _share_array(a):
+    """
+    Copy a into a new shared memory block, return (block, descriptor).
+    """
+    shm = shared_memory.SharedMemory(create=True, size=max(a.nbytes, 1))
+    np.ndarray(a.shape, dtype=a.dtype, buffer=shm.buf)[...] = a
+    return shm, (shm.name, a.shape, a.dtype.str)
+
+
+def _attach_grids(descriptors):
+    """
+    Worker initializer: map the shared grids as read-only arrays.
+    """
+    for name, (shm_name, shape, dtype) in descriptors.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        _SHARED.append(shm)   # keep the mapping alive for the worker's lifetime
+        grid = np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+        grid.flags.writeable = False
+        _GRIDS[name] = grid
+
+
+# -----------------------------
+# ONE TRIAL
+# -----------------------------
+def draw_parameters(rng, ranges=DEFAULT_RANGES):
+    """
+    One random parameter set, every value uniform in its range.
+    """
+    return {name: float(rng.uniform(low, high)) for name, (low, high) in ranges.items()}
+
+
+def _errors(x, y):
+    err = x - y
+    return float(np.max(np.abs(err))), float(np.sqrt(np.mean(err**2)))
+
+
+def run_trial(seed_seq, ranges=DEFAULT_RANGES):
+    """
+    generate -> convolve with an impulse -> compare, for one random draw.
+
+    Uses the grids in _GRIDS. Returns the parameters and the error metrics.
+    """
+    t = _GRIDS["t"]
+    n = _GRIDS["n"]
+    rng = np.random.default_rng(seed_seq)
+    p = draw_parameters(rng, ranges)
+
+    # CT: x(t) * h_width(t) ≈ x(t)
+    x_ct = sin_ct(t, f=p["f_ct"], A=p["A_ct"], phase=p["phase_ct"])
+    x_ct = x_ct + p["noise_std_ct"] * rng.standard_normal(len(t))
+    h_ct = impulse_like_ct(t, width=p["width_imp_ct"])
+
+    _, y_ct = conv_ct_manual(t, x_ct, h_ct, mode="same")
+    ct_max, ct_rmse = _errors(x_ct, y_ct)
+
+    # DT: x[n] * δ[n] = x[n]
+    x_dt = sin_dt(n, f=p["f_dt"], A=p["A_dt"], phase=p["phase_dt"])
+    y_dt = conv_dt_manual(x_dt, impulse_dt(n), mode="same")
+    dt_max, dt_rmse = _errors(x_dt, y_dt)
+
+    return dict(p, ct_max_error=ct_max, ct_rmse=ct_rmse, dt_max_error=dt_max, dt_rmse=dt_rmse)
+
+
+# -----------------------------
+# RUNNER
+# -----------------------------
+def run_monte_carlo(n_trials, seed=0, t=None, n=None, workers=None):
+    """
+    Run n_trials independent trials, in a process pool.
+
+    Inputs:
+    - n_trials: number of random parameter sets
+    - seed: root seed, the same seed always gives the same results
+    - t, n: CT time grid and DT index grid (main.py's grids by default)
+    - workers: number of processes (None = one per CPU, 0 = run in-process)
+
+    Returns a list of per-trial result dicts, in trial order.
+    """
+    if t is None:
+        t = np.linspace(-1, 1, DEFAULT_CT_POINTS)
+    if n is None:
+        n = np.arange(-DEFAULT_DT_MAX, DEFAULT_DT_MAX + 1)
+
+    seeds = np.random.SeedSequence(seed).spawn(n_trials)
+
+    if workers == 0:
+        _GRIDS.update(t=np.asarray(t), n=np.asarray(n))
+        return [run_trial(s) for s in seeds]
+
+    blocks = []
+    try:
+        descriptors = {}
+        for name, grid in (("t", np.asarray(t)), ("n", np.asarray(n))):
+            shm, descriptors[name] = _share_array(grid)
+            blocks.append(shm)
+
+        n_workers = workers or os.cpu_count() or 1
+        chunksize = max(1, n_trials // (4 * n_workers))
+        with ProcessPoolExecutor(
+            max_workers=n_workers, initializer=_attach_grids, initargs=(descriptors,)
+        ) as pool:
+            return list(pool.map(run_trial, seeds, chunksize=chunksize))
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+
+
+# -----------------------------
+# AGGREGATION
+# -----------------------------
+def error_stats(values):
+    """
+    count / mean / std / max and percentiles of one error metric.
+    """
+    values = np.asarray(values, dtype=float)
+    if len(values) == 0:
+        return {"count": 0}
+    stats = {
+        "count": int(len(values)),
+        "mean": float(values.mean()),
+        "std": float(values.std()),
+        "max": float(values.max()),
+    }
+    for q, v in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+        stats[f"p{q}"] = float(v)
+    return stats
+
+
+def summarize(results, n_buckets=5, ranges=DEFAULT_RANGES):
+    """
+    Error statistics per impulse-width bucket (CT) and overall (CT + DT).
+    """
+    widths = np.array([r["width_imp_ct"] for r in results])
+    edges = np.linspace(*ranges["width_imp_ct"], n_buckets + 1)
+    bucket = np.clip(np.searchsorted(edges, widths, side="right") - 1, 0, n_buckets - 1)
+
+    summary = {"trials": len(results), "buckets": []}
+    for b in range(n_buckets):
+        rows = [r for r, k in zip(results, bucket) if k == b]
+        summary["buckets"].append({
+            "width_min": float(edges[b]),
+            "width_max": float(edges[b + 1]),
+            "ct_max_error": error_stats([r["ct_max_error"] for r in rows]),
+            "ct_rmse": error_stats([r["ct_rmse"] for r in rows]),
+        })
+
+    for metric in ("ct_max_error", "ct_rmse", "dt_max_error", "dt_rmse"):
+        summary[metric] = error_stats([r[metric] for r in results])
+    return summary
+
+
+def print_summary(summary):
+    print(f"\n============ MONTE CARLO IMPULSE VALIDATION ({summary['trials']} trials) ============")
+    print(f"{'width bucket':<20}{'count':>7}{'mean max err':>15}{'p95 max err':>14}{'mean RMSE':>12}{'p95 RMSE':>12}")
+    for b in summary["buckets"]:
+        label = f"{b['width_min']:.4f}-{b['width_max']:.4f}"
+        m, r = b["ct_max_error"], b["ct_rmse"]
+        if m["count"] == 0:
+            print(f"{label:<20}{0:>7}")
+            continue
+        print(f"{label:<20}{m['count']:>7}{m['mean']:>15.6f}{m['p95']:>14.6f}{r['mean']:>12.6f}{r['p95']:>12.6f}")
+    print(f"DT x[n] * δ[n] = x[n]: max error over all trials = {summary['dt_max_error']['max']:.3e}")
+    print("=" * 78)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Monte Carlo validation of x * δ ≈ x.")
+    parser.add_argument("--trials", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="processes (0 = in-process)")
+    parser.add_argument("--buckets", type=int, default=5, help="number of impulse-width buckets")
+    parser.add_argument("--out", help="write per-trial results + summary to this JSON file")
+    args = parser.parse_args(argv)
+
+    results = run_monte_carlo(args.trials, seed=args.seed, workers=args.workers)
+    summary = summarize(results, n_buckets=args.buckets)
+    print_summary(summary)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump({"seed": args.seed, "summary": summary, "trials": results}, f, indent=2)
+        print(f"Results written to {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,31 @@
+###RANDOM PARAMETER RANGES
+#the ranges main.py draws its random signals from, and the default grids.
+#monte_carlo.py samples the same ranges, so both live here.
+
+import numpy as np
+
+
+#random parameter ranges, drawn in this order from the seeded rng.
+#an override still consumes its draw, so overriding one parameter
+#leaves all the others unchanged for the same seed.
+PARAM_RANGES = {
+    # CT
+    "A_ct": (0.5, 2.0),
+    "f_ct": (2.0, 10.0),
+    "phase_ct": (0.0, 2*np.pi),
+    "a_ct": (0.5, 5.0),
+    "width_imp_ct": (0.005, 0.05),
+    "noise_std_ct": (0.0, 0.05),
+    # DT
+    "A_dt": (0.5, 2.0),
+    "f_dt": (0.05, 0.45),   # cycles/sample
+    "phase_dt": (0.0, 2*np.pi),
+    "a_dt": (0.7, 0.99),
+    # CT impulse width validation
+    "width_test": (0.005, 0.05),
+}
+
+# odd number of points so t = 0 is a grid sample: impulse-like kernels are
+# then centred on a sample and "same" convolution lands exactly on t
+DEFAULT_CT_POINTS = 2001
+DEFAULT_DT_MAX = 20
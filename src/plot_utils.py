@@ -3,8 +3,48 @@
 #this keeps the plots consistent and avoids repetition of code.
 
 import os
+import sys
+import inspect
+import shutil
+import hashlib
+import traceback
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
-import matplotlib.pyplot as plt
+
+import instrument
+from instrument import instrumented
+
+
+##LAZY MATPLOTLIB
+#matplotlib is imported on the first plot call, not with this module, so
+#scripts and worker processes that never plot do not pay for it.
+#without a display (and no MPLBACKEND set) the Agg backend is selected
+#up front instead of letting matplotlib probe the GUI toolkits.
+_PLT = None
+
+
+def _headless():
+    if os.environ.get("MPLBACKEND") or sys.platform in ("win32", "darwin"):
+        return False
+    return not (os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+
+
+def _pyplot():
+    """
+    matplotlib.pyplot, imported (and its backend chosen) on first use.
+    """
+    global _PLT
+    if _PLT is None:
+        import matplotlib
+        if _headless():
+            matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+        _PLT = plt
+    return _PLT
+
+
+#resolution of every saved figure
+PLOT_DPI = 300
 
 
 def ensure_folder(folder_path):
@@ -15,8 +55,83 @@ def ensure_folder(folder_path):
         os.makedirs(folder_path)
 
 
+#DT plots draw at most this many stems by default
+MAX_STEMS = 500
+
+
+##DECIMATION FOR LONG SIGNALS
+def minmax_envelope(t, x, n_bins):
+    """
+    Reduce a signal to its min and max in each of n_bins equal bins.
+
+    Returns 2 * n_bins points (min and max of every bin, in time order),
+    so a line plot of the result covers exactly the same vertical range
+    in every pixel column as the full signal, narrow spikes included.
+    """
+    N = len(x)
+    if n_bins <= 0 or N <= 2 * n_bins:
+        return t, x
+
+    bin_size = -(-N // n_bins)
+    n_full = N // bin_size
+    starts = np.arange(0, N, bin_size)
+
+    blocks = np.asarray(x)[:n_full * bin_size].reshape(n_full, bin_size)
+    i_min = blocks.argmin(axis=1) + starts[:n_full]
+    i_max = blocks.argmax(axis=1) + starts[:n_full]
+
+    if n_full < len(starts):
+        tail = np.asarray(x)[n_full * bin_size:]
+        i_min = np.append(i_min, tail.argmin() + starts[-1])
+        i_max = np.append(i_max, tail.argmax() + starts[-1])
+
+    # keep each bin's two points in time order so the line does not zigzag
+    idx = np.column_stack((np.minimum(i_min, i_max), np.maximum(i_min, i_max))).ravel()
+    return np.asarray(t)[idx], np.asarray(x)[idx]
+
+
+def decimate_ct(t, x, max_points=None, fig_width=None):
+    """
+    Min/max envelope of a CT signal if it has more than max_points samples.
+
+    max_points:
+    - None: two points per pixel column of the saved figure
+      (fig_width inches * PLOT_DPI, default figure width if not given)
+    - 0: no decimation, plot every sample
+    """
+    if max_points is None:
+        if fig_width is None:
+            fig_width = _pyplot().rcParams["figure.figsize"][0]
+        max_points = 2 * int(fig_width * PLOT_DPI)
+    if max_points == 0 or len(x) <= max_points:
+        return t, x
+    return minmax_envelope(t, x, max_points // 2)
+
+
+def decimate_dt(n, x, max_stems=MAX_STEMS):
+    """
+    Cap the number of stems of a DT plot.
+
+    The samples are split into max_stems equal bins and only the sample
+    with the largest magnitude in each bin is kept, so impulses and other
+    spikes are never dropped. max_stems=0 keeps every sample.
+    """
+    N = len(x)
+    if max_stems == 0 or N <= max_stems:
+        return n, x
+
+    x = np.asarray(x)
+    edges = np.linspace(0, N, max_stems + 1).astype(int)
+    idx = np.array([
+        start + np.argmax(np.abs(x[start:stop]))
+        for start, stop in zip(edges[:-1], edges[1:])
+    ])
+    return np.asarray(n)[idx], x[idx]
+
+
 ##PLOTTING CONTINUOUS-TIME SIGNALS
-def plot_ct_signal(t, x, title, filename, folder="plots/signals"):
+@instrumented
+def plot_ct_signal(t, x, title, filename, folder="plots/signals", max_points=None):
     """
     Plot a continuous-time (CT) signal.
 
@@ -26,23 +141,32 @@ def plot_ct_signal(t, x, title, filename, folder="plots/signals"):
     - title: plot title (string)
     - filename: name of the png file to save
     - folder: folder path where plot is saved
+    - max_points: longer signals are drawn as a min/max envelope
+      (see decimate_ct, None = matched to the figure resolution)
     """
+    plt = _pyplot()
 
     ensure_folder(folder)
+    save_path = os.path.join(folder, filename)
+    key = plot_cache_key("ct_signal", (t, x), (title, max_points))
+    if restore_cached_plot(save_path, key):
+        return
+
     plt.figure()
-    plt.plot(t, x)
+    plt.plot(*decimate_ct(t, x, max_points))
     plt.xlabel("Time (t)")
     plt.ylabel("Amplitude")
     plt.title(title)
     plt.grid(True)
-    save_path = os.path.join(folder, filename)
-    plt.savefig(save_path, dpi=300, bbox_inches="tight")
+    plt.savefig(save_path, dpi=PLOT_DPI, bbox_inches="tight")
     plt.close()
+    store_cached_plot(save_path, key)
 
 
 
 ##PLOTTING DISCRETE-TIME SIGNALS
-def plot_dt_signal(n, x, title, filename, folder="plots/signals"):
+@instrumented
+def plot_dt_signal(n, x, title, filename, folder="plots/signals", max_stems=MAX_STEMS):
     """
     Plot a discrete-time (DT) signal.
 
@@ -52,21 +176,30 @@ def plot_dt_signal(n, x, title, filename, folder="plots/signals"):
     - title: plot title (string)
     - filename: name of the png file to save
     - folder: folder path where plot is saved
+    - max_stems: longer signals keep only the largest sample per bin
+      (see decimate_dt, 0 = draw every stem)
     """
+    plt = _pyplot()
 
     ensure_folder(folder)
+    save_path = os.path.join(folder, filename)
+    key = plot_cache_key("dt_signal", (n, x), (title, max_stems))
+    if restore_cached_plot(save_path, key):
+        return
+
     plt.figure()
-    markerline, stemlines, baseline = plt.stem(n, x)
+    markerline, stemlines, baseline = plt.stem(*decimate_dt(n, x, max_stems))
     plt.xlabel("Index (n)")
     plt.ylabel("Amplitude")
     plt.title(title)
     plt.grid(True)
-    save_path = os.path.join(folder, filename)
-    plt.savefig(save_path, dpi=300, bbox_inches="tight")
+    plt.savefig(save_path, dpi=PLOT_DPI, bbox_inches="tight")
     plt.close()
+    store_cached_plot(save_path, key)
 
 
 ##plotting comparision of two signals
+@instrumented
 def plot_ct_dt_comparison(t, x_ct, n, x_dt, title, filename, folder="plots/signals"):
     """
     Plot CT and DT versions of a signal in one figure (side-by-side).
@@ -78,13 +211,19 @@ def plot_ct_dt_comparison(t, x_ct, n, x_dt, title, filename, folder="plots/signa
     - filename: save filename
     - folder: folder path
     """
+    plt = _pyplot()
 
     ensure_folder(folder)
+    save_path = os.path.join(folder, filename)
+    key = plot_cache_key("ct_dt_comparison", (t, x_ct, n, x_dt), (title, MAX_STEMS))
+    if restore_cached_plot(save_path, key):
+        return
+
     plt.figure(figsize=(10, 4))
 
     # ---- CT subplot ----
     plt.subplot(1, 2, 1)
-    plt.plot(t, x_ct)
+    plt.plot(*decimate_ct(t, x_ct, fig_width=5))
     plt.xlabel("Time (t)")
     plt.ylabel("Amplitude")
     plt.title("Continuous-Time")
@@ -92,23 +231,374 @@ def plot_ct_dt_comparison(t, x_ct, n, x_dt, title, filename, folder="plots/signa
 
     # ---- DT subplot ----
     plt.subplot(1, 2, 2)
-    plt.stem(n, x_dt)
+    plt.stem(*decimate_dt(n, x_dt))
     plt.xlabel("Index (n)")
     plt.ylabel("Amplitude")
     plt.title("Discrete-Time")
     plt.grid(True)
 
     plt.suptitle(title)
+    plt.savefig(save_path, dpi=PLOT_DPI, bbox_inches="tight")
+    plt.close()
+    store_cached_plot(save_path, key)
+
+
+##PLOTTING OVERLAY OF TWO DT SIGNALS
+@instrumented
+def plot_dt_overlay(n1, x1, label1, n2, x2, label2, title, filename, folder="plots/convolution"):
+    """
+    Stem plot of two DT signals on the same axes (e.g. input vs output).
+
+    Inputs:
+    - n1, x1, label1: first signal and its legend label
+    - n2, x2, label2: second signal and its legend label
+    - title: plot title
+    - filename: save filename
+    - folder: folder path
+    """
+    plt = _pyplot()
+
+    ensure_folder(folder)
+    save_path = os.path.join(folder, filename)
+    key = plot_cache_key("dt_overlay", (n1, x1, n2, x2), (label1, label2, title, MAX_STEMS))
+    if restore_cached_plot(save_path, key):
+        return
+
+    plt.figure(figsize=(10, 5))
+    plt.stem(*decimate_dt(n1, x1), label=label1)
+    plt.stem(*decimate_dt(n2, x2), label=label2)
+    plt.title(title)
+    plt.xlabel("n")
+    plt.ylabel("Amplitude")
+    plt.grid(True)
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig(save_path, dpi=PLOT_DPI)
+    plt.close()
+    store_cached_plot(save_path, key)
+
+
+##PLOTTING OVERLAY OF TWO CT SIGNALS
+@instrumented
+def plot_ct_overlay(t1, x1, label1, t2, x2, label2, title, filename, folder="plots/convolution"):
+    """
+    Plot two CT signals on the same axes, the second one dashed.
+
+    Inputs:
+    - t1, x1, label1: first signal and its legend label
+    - t2, x2, label2: second signal and its legend label
+    - title: plot title
+    - filename: save filename
+    - folder: folder path
+    """
+    plt = _pyplot()
+
+    ensure_folder(folder)
     save_path = os.path.join(folder, filename)
-    plt.savefig(save_path, dpi=300, bbox_inches="tight")
+    key = plot_cache_key("ct_overlay", (t1, x1, t2, x2), (label1, label2, title))
+    if restore_cached_plot(save_path, key):
+        return
+
+    plt.figure(figsize=(12, 6))
+    plt.plot(*decimate_ct(t1, x1, fig_width=12), label=label1)
+    plt.plot(*decimate_ct(t2, x2, fig_width=12), "--", label=label2)
+    plt.title(title)
+    plt.xlabel("Time (t)")
+    plt.ylabel("Amplitude")
+    plt.grid(True)
+    plt.legend()
+    plt.tight_layout()
+    plt.savefig(save_path, dpi=PLOT_DPI)
     plt.close()
+    store_cached_plot(save_path, key)
 
 
 ##SET FORMATTING PARAMETERS FOR ALL PLOTS
-def set_plot_style():
+PLOT_STYLE = {
+    "font.size": 11,
+    "axes.titlesize": 12,
+    "axes.labelsize": 11,
+    "legend.fontsize": 10,
+    "figure.titlesize": 13,
+}
+
+
+def set_plot_style(style=None):
+    """
+    Apply PLOT_STYLE (or the given rcParams dict) to matplotlib.
+    """
+    plt = _pyplot()
+    for key, value in (style or PLOT_STYLE).items():
+        plt.rcParams[key] = value
+
+
+def current_plot_style():
+    """
+    The rcParams values that set_plot_style controls, as currently set.
+    """
+    plt = _pyplot()
+    return {key: plt.rcParams[key] for key in PLOT_STYLE}
+
+
+
+
+##PLOT CACHE
+#every saved figure gets a sidecar file "<name>.png.hash" with a hash of
+#everything that went into it (arrays, titles, style, dpi). if the hash of a
+#new request matches, savefig is skipped. rendered pngs are also kept in a
+#content-addressed folder (<hash>.png) so switching back to an older set of
+#inputs is a file copy instead of a render.
+PLOT_CACHE = {
+    "enabled": True,
+    "force": False,                  # render + overwrite even on a hit
+    "folder": "plots/.cache",
+    "max_bytes": 256 * 2**20,        # oldest cached pngs are evicted above this
+}
+
+
+def configure_plot_cache(enabled=None, force=None, folder=None, max_bytes=None):
+    """
+    Change the plot cache settings (None leaves a setting unchanged).
+    """
+    updates = {"enabled": enabled, "force": force, "folder": folder, "max_bytes": max_bytes}
+    for name, value in updates.items():
+        if value is not None:
+            PLOT_CACHE[name] = value
+
+
+def plot_cache_key(kind, arrays, labels):
+    """
+    Hash of a plot request: plot kind, array contents, text labels,
+    the style applied by set_plot_style, dpi and the matplotlib version.
+    """
+    digest = hashlib.sha256()
+    digest.update(kind.encode())
+    for a in arrays:
+        a = np.ascontiguousarray(a)
+        digest.update(f"{a.shape}{a.dtype.str}".encode())
+        digest.update(a.data)
+    digest.update(repr(labels).encode())
+    digest.update(repr(sorted(current_plot_style().items())).encode())
+    digest.update(f"dpi={PLOT_DPI} mpl={_pyplot().matplotlib.__version__}".encode())
+    return digest.hexdigest()
+
+
+def restore_cached_plot(save_path, key):
+    """
+    True if save_path already holds the figure for key (or it could be
+    copied from the cache folder), so the caller can skip rendering.
+    """
+    if not PLOT_CACHE["enabled"] or PLOT_CACHE["force"]:
+        return False
+
+    sidecar = save_path + ".hash"
+    if os.path.exists(save_path) and _read_text(sidecar) == key:
+        return True
+
+    cached = os.path.join(PLOT_CACHE["folder"], key + ".png")
+    try:
+        shutil.copyfile(cached, save_path)
+        os.utime(cached)   # mark as recently used
+    except OSError:
+        return False
+
+    _write_text(sidecar, key)
+    return True
+
+
+def store_cached_plot(save_path, key):
+    """
+    Record the hash of a freshly rendered figure and keep a copy of it.
+    """
+    if not PLOT_CACHE["enabled"]:
+        return
+
+    _write_text(save_path + ".hash", key)
+
+    folder = PLOT_CACHE["folder"]
+    ensure_folder(folder)
+    cached = os.path.join(folder, key + ".png")
+    # copy under a temporary name first so other processes never see half a file
+    tmp = f"{cached}.{os.getpid()}.tmp"
+    shutil.copyfile(save_path, tmp)
+    os.replace(tmp, cached)
+
+    evict_plot_cache()
+
+
+def evict_plot_cache(max_bytes=None):
+    """
+    Delete the least recently used cached pngs until the cache folder
+    is below max_bytes (PLOT_CACHE["max_bytes"] by default).
+    """
+    if max_bytes is None:
+        max_bytes = PLOT_CACHE["max_bytes"]
+
+    folder = PLOT_CACHE["folder"]
+    entries = []
+    for name in os.listdir(folder) if os.path.isdir(folder) else []:
+        if not name.endswith(".png"):
+            continue
+        path = os.path.join(folder, name)
+        try:
+            info = os.stat(path)
+        except OSError:
+            continue
+        entries.append((info.st_mtime, info.st_size, path))
+
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            pass   # already evicted by another process
+        total -= size
+
+
+def _read_text(path):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def _write_text(path, text):
+    with open(path, "w") as f:
+        f.write(text + "\n")
+
+
+
+
+##PARALLEL RENDERING
+class RenderQueue:
+    """
+    Collects plot jobs and renders them in a pool of worker processes.
+
+    submit() returns right away, so the caller can keep computing while
+    figures are drawn. wait() is the barrier: it blocks until every job
+    is done and reports which files failed.
+
+    Inputs:
+    - max_workers: number of render processes (None = one per CPU,
+      0 = render synchronously in this process)
+
+    Arrays passed to submit() are sent to the workers as they are queued,
+    so they must not be modified in place afterwards.
+
+    Example:
+        plots = RenderQueue()
+        plots.submit(plot_ct_signal, t, x, "CT Sine", "ct_sine.png")
+        ...
+        plots.wait()
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers
+        self.jobs = []
+        self._pool = None
+
+    def submit(self, plot_func, *args, **kwargs):
+        """
+        Queue plot_func(*args, **kwargs), e.g. submit(plot_ct_signal, t, x, title, filename).
+        """
+        path = _job_path(plot_func, args, kwargs)
+
+        if self.max_workers == 0:
+            self.jobs.append((path, _run_now(plot_func, args, kwargs)))
+            return
+
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=_init_render_worker,
+                initargs=(current_plot_style(), dict(PLOT_CACHE), instrument.settings()),
+            )
+        self.jobs.append((path, self._pool.submit(_render_job, plot_func, args, kwargs)))
+
+    def wait(self, verbose=True):
+        """
+        Block until all queued plots are rendered.
+
+        Returns a list of (save_path, error message) for the failed jobs.
+        """
+        failures = []
+        for path, job in self.jobs:
+            if job is None or isinstance(job, str):
+                error = job
+            else:
+                try:
+                    # workers send back their instrumentation events too
+                    error, events = job.result()
+                    instrument.add_events(events)
+                except Exception as exc:
+                    # worker died or the job could not be pickled
+                    error = f"{type(exc).__name__}: {exc}"
+            if error is not None:
+                failures.append((path, error))
+
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+        if verbose:
+            print(f"\nRendered {len(self.jobs) - len(failures)}/{len(self.jobs)} plots.")
+            for path, error in failures:
+                print(f"FAILED {path}:\n{error}")
+
+        self.jobs = []
+        return failures
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.wait()
+        return False
+
+
+def _job_path(plot_func, args, kwargs):
+    """
+    Where a plot job will save its figure (folder/filename), for reporting.
+    """
+    try:
+        bound = inspect.signature(plot_func).bind(*args, **kwargs)
+    except TypeError:
+        return getattr(plot_func, "__name__", repr(plot_func))
+    bound.apply_defaults()
+    params = bound.arguments
+    if "filename" not in params:
+        return plot_func.__name__
+    return os.path.join(params.get("folder", ""), params["filename"])
+
+
+def _run_now(plot_func, args, kwargs):
+    """
+    Run one plot job, return None on success or the formatted traceback.
+    """
+    try:
+        plot_func(*args, **kwargs)
+    except Exception:
+        _pyplot().close("all")
+        return traceback.format_exc()
+    return None
+
+
+def _init_render_worker(style, cache_settings, instrument_settings):
+    """
+    Runs once in every render process: headless backend + parent's
+    style, plot cache and instrumentation settings.
+    """
+    _pyplot().switch_backend("Agg")
+    set_plot_style(style)
+    PLOT_CACHE.update(cache_settings)
+    # a forked worker starts with a copy of the parent's events
+    instrument.reset()
+    instrument.configure(**instrument_settings)
+
 
-    plt.rcParams["font.size"] = 11
-    plt.rcParams["axes.titlesize"] = 12
-    plt.rcParams["axes.labelsize"] = 11
-    plt.rcParams["legend.fontsize"] = 10
-    plt.rcParams["figure.titlesize"] = 13
+def _render_job(plot_func, args, kwargs):
+    error = _run_now(plot_func, args, kwargs)
+    return error, instrument.take_events()
@@ -0,0 +1,188 @@
+###RECURSIVE (IIR) FILTERS
+
+#exp_decay_dt as a system: h[n] = a^n u[n]
+#convolving with it needs a truncated kernel and O(N*M) work, but the same
+#system is the one-pole recursion
+#   y[n] = a*y[n-1] + x[n]
+#which runs in O(N) and has no truncation error.
+#
+#exp_decay_ct is the same recursion on the sampled grid:
+#   y(t_n) ≈ dt * sum_k x(t_k) e^(-a (t_n - t_k))  ->  pole e^(-a dt), gain dt
+
+import numpy as np
+
+from convolution import conv_dt_numpy
+from signal_generator import exp_decay_dt
+
+
+#samples per block in the block evaluation (see FirstOrderSystem._run)
+DEFAULT_BLOCK = 128
+
+
+class FirstOrderSystem:
+    """
+    One-pole recursive system:
+        y[n] = a*y[n-1] + b*x[n]
+    impulse response h[n] = b * a^n * u[n] (b * exp_decay_dt(n, a)).
+
+    process() keeps y[n-1] between calls, so a signal can be fed in chunks;
+    filter() always starts from rest (zero state).
+    Signals may be batched, the recursion runs along the last axis.
+
+    Inputs:
+    - a: pole (|a| < 1 for a stable, decaying response)
+    - b: gain
+    - block_size: samples per block of the vectorized evaluation
+    """
+
+    def __init__(self, a, b=1.0, block_size=DEFAULT_BLOCK):
+        block_size = int(block_size)
+        if block_size < 1:
+            raise ValueError("block_size must be a positive integer.")
+
+        self.a = a
+        self.b = b
+        self.block_size = block_size
+        self._dtype = np.result_type(a, b, 1.0)
+
+        # T[i, j] = a^(i-j) for j <= i: one block of the recursion from rest
+        # p[i] = a^(i+1): how the previous output carries into the block
+        i = np.arange(block_size)
+        lag = i[:, None] - i[None, :]
+        self._T = np.where(lag >= 0, np.power(a, np.maximum(lag, 0), dtype=self._dtype), 0)
+        self._p = np.power(a, i + 1, dtype=self._dtype)
+
+        self.reset()
+
+    @classmethod
+    def from_exp_decay_dt(cls, a=0.9, **kwargs):
+        """
+        The system whose impulse response is exp_decay_dt(n, a).
+        """
+        return cls(a, 1.0, **kwargs)
+
+    @classmethod
+    def from_exp_decay_ct(cls, a, dt, **kwargs):
+        """
+        Sampled version of h(t) = exp_decay_ct(t, a) on a grid with step dt,
+        scaled like conv_ct_manual: pole e^(-a dt), gain dt.
+        """
+        return cls(np.exp(-a * dt), dt, **kwargs)
+
+    def __repr__(self):
+        return f"FirstOrderSystem(a={self.a!r}, b={self.b!r})"
+
+    def reset(self):
+        """
+        Back to rest: y[n-1] = 0.
+        """
+        self.state = np.zeros((), dtype=self._dtype)
+
+    def impulse_response(self, n):
+        """
+        h[n] on the index array n.
+        """
+        return self.b * exp_decay_dt(n, self.a)
+
+    def process(self, chunk):
+        """
+        Feed the next input samples, get the same number of output samples.
+        """
+        y, self.state = self._run(np.asarray(chunk), self.state)
+        return y
+
+    def filter(self, x):
+        """
+        Output for the whole signal x, starting from rest (state is untouched).
+        """
+        y, _ = self._run(np.asarray(x), np.zeros((), dtype=self._dtype))
+        return y
+
+    def _run(self, x, state):
+        """
+        Block evaluation of the recursion.
+
+        Every block of B samples is the recursion from rest (one matrix
+        product for all blocks at once) plus the previous output carried in:
+            y_block = b * (T @ x_block) + a^(i+1) * y_prev
+        only the carries are passed from block to block in Python,
+        so the loop runs N / B times.
+        """
+        B = self.block_size
+        N = x.shape[-1]
+        dtype = np.result_type(x, self._dtype)
+        lead = np.broadcast_shapes(x.shape[:-1], np.shape(state))
+
+        n_blocks = -(-N // B)
+        blocks = np.zeros(x.shape[:-1] + (n_blocks * B,), dtype=dtype)
+        blocks[..., :N] = x
+        blocks = blocks.reshape(x.shape[:-1] + (n_blocks, B))
+
+        y = (blocks @ self._T.T) * self.b
+        y = np.broadcast_to(y, lead + (n_blocks, B)).copy()
+
+        carry = np.broadcast_to(np.asarray(state, dtype=dtype), lead)
+        for k in range(n_blocks):
+            y[..., k, :] += carry[..., None] * self._p
+            carry = y[..., k, -1]
+
+        y = y.reshape(lead + (n_blocks * B,))[..., :N]
+        new_state = y[..., -1].copy() if N else np.array(state, dtype=dtype)
+        return y, new_state
+
+
+class CascadeSystem:
+    """
+    Systems applied one after the other (e.g. several FirstOrderSystems),
+    the impulse response is the convolution of the sections' responses.
+
+    process() / filter() / reset() behave as in FirstOrderSystem.
+    """
+
+    def __init__(self, *sections):
+        if not sections:
+            raise ValueError("A cascade needs at least one section.")
+        self.sections = list(sections)
+
+    def __repr__(self):
+        return f"CascadeSystem({', '.join(map(repr, self.sections))})"
+
+    def reset(self):
+        for section in self.sections:
+            section.reset()
+
+    def process(self, chunk):
+        for section in self.sections:
+            chunk = section.process(chunk)
+        return chunk
+
+    def filter(self, x):
+        for section in self.sections:
+            x = section.filter(x)
+        return x
+
+    def impulse_response(self, n):
+        """
+        Response of the cascade to δ[n], for a causal index array n
+        (n[0] = 0, step 1).
+        """
+        n = np.asarray(n)
+        return self.filter((n == 0).astype(float))
+
+
+# -----------------------------
+# CHECK AGAINST CONVOLUTION
+# -----------------------------
+def compare_with_convolution(x, system):
+    """
+    Max |difference| between system.filter(x) and convolving x with the
+    system's explicit kernel h[n], n = 0 .. len(x)-1, via conv_dt_numpy.
+
+    The kernel is as long as x, so the truncation of h never reaches the
+    first len(x) outputs that are compared.
+    """
+    x = np.asarray(x)
+    n = np.arange(len(x))
+    y_rec = system.filter(x)
+    y_conv = conv_dt_numpy(x, system.impulse_response(n))[:len(x)]
+    return float(np.max(np.abs(y_rec - y_conv)))
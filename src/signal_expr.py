@@ -0,0 +1,294 @@
+###LAZY SIGNAL EXPRESSIONS
+
+#signal_generator / signal_operations compute every step eagerly, so
+#   s = sin_ct(t) + noise;  y = add_signals(s, unit_step_ct(t))
+#allocates a full array per step. here the same steps only build a graph:
+#   s = generator("sin_ct", f=5) + signal(noise)
+#   y = s + generator("unit_step_ct")
+#and evaluate(y, t) runs it in one pass over cache-sized chunks of t, so the
+#only full-size array is the output.
+#
+#nodes are interned: building the same expression twice gives the same node,
+#so a shared subexpression (e.g. the unit step used by both s + u and s * u)
+#is computed once per chunk when evaluated together:
+#   s_plus_u, s_mult_u = evaluate([s + u, s * u], t)
+
+import weakref
+
+import numpy as np
+
+import signal_generator
+from dtypes import resolve_dtype
+from signal_operations import Signal
+
+
+#samples per chunk: a handful of float64 chunks stay inside the L2 cache
+DEFAULT_CHUNK = 8192
+
+#every live node, keyed on (kind, params, children)
+_INTERN = weakref.WeakValueDictionary()
+
+
+class Expr:
+    """
+    A node of a lazy signal expression.
+
+    Build with generator() / signal() / const() and the operators
+    + - * (with other expressions or scalars), .shift(s) and .reverse().
+    Nothing is computed until evaluate().
+    """
+
+    __slots__ = ("kind", "params", "children", "__weakref__")
+
+    def __init__(self, kind, params, children):
+        self.kind = kind
+        self.params = params
+        self.children = children
+
+    def __repr__(self):
+        if self.kind in ("generator", "const"):
+            return f"{self.kind}{self.params}"
+        if self.kind == "signal":
+            return f"signal(len={len(self.params[0])})"
+        args = ", ".join(map(repr, self.children))
+        extra = f", {self.params[0]!r}" if self.params else ""
+        return f"{self.kind}({args}{extra})"
+
+    def __add__(self, other):
+        return add(self, other)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        return add(self, scale(_as_expr(other), -1))
+
+    def __rsub__(self, other):
+        return add(_as_expr(other), scale(self, -1))
+
+    def __mul__(self, other):
+        if isinstance(other, Expr):
+            return multiply(self, other)
+        return scale(self, other)
+
+    __rmul__ = __mul__
+
+    def __neg__(self):
+        return scale(self, -1)
+
+    def shift(self, shift):
+        return time_shift(self, shift)
+
+    def reverse(self):
+        return time_reverse(self)
+
+    def evaluate(self, axis, chunk_size=DEFAULT_CHUNK, dtype=None, out=None):
+        return evaluate(self, axis, chunk_size=chunk_size, dtype=dtype, out=out)
+
+
+def _node(kind, params, children=()):
+    # arrays are not hashable: data leaves are keyed on the array object
+    hashable = tuple(("array", id(p)) if isinstance(p, np.ndarray) else p for p in params)
+    key = (kind, hashable, tuple(id(c) for c in children))
+    node = _INTERN.get(key)
+    if node is None:
+        node = Expr(kind, params, tuple(children))
+        _INTERN[key] = node
+    return node
+
+
+def _as_expr(value):
+    return value if isinstance(value, Expr) else const(value)
+
+
+# -----------------------------
+# LEAVES
+# -----------------------------
+def generator(func, **params):
+    """
+    Lazy generator call: func(axis, **params) on the evaluation axis.
+
+    func - a signal_generator function or its name (e.g. "sin_ct"),
+           params must be scalars
+    """
+    if isinstance(func, str):
+        func = getattr(signal_generator, func)
+    return _node("generator", (func, tuple(sorted(params.items()))))
+
+
+def signal(x, axis=None):
+    """
+    Leaf for already sampled data.
+
+    - axis None: sample k belongs to the k-th sample of the evaluation axis
+      (the data must cover it; shift/reverse need a grid, pass axis then)
+    - axis: the data's own uniform t / n grid (or pass a Signal); the leaf
+      then reads 0 outside it, and shifts / reversal map onto its grid
+    """
+    if isinstance(x, Signal):
+        sig = x
+    elif axis is not None:
+        sig = Signal.from_axis(axis, x)
+    else:
+        return _node("signal", (np.asanyarray(x), None))
+
+    if not sig.uniform:
+        raise ValueError("Lazy signals need a uniform grid.")
+    return _node("signal", (sig.data, (sig.start, sig.step)))
+
+
+def const(value):
+    return _node("const", (value,))
+
+
+# -----------------------------
+# OPERATIONS
+# -----------------------------
+def scale(x, scale):
+    """
+    y = scale * x
+    """
+    return _node("scale", (scale,), (x,))
+
+
+def add(x1, x2):
+    """
+    y = x1 + x2 (operands sorted so x1 + x2 and x2 + x1 are the same node)
+    """
+    return _node("add", (), sorted((_as_expr(x1), _as_expr(x2)), key=id))
+
+
+def multiply(x1, x2):
+    """
+    y = x1 * x2 (operands sorted like in add)
+    """
+    return _node("multiply", (), sorted((_as_expr(x1), _as_expr(x2)), key=id))
+
+
+def time_shift(x, shift):
+    """
+    y(t) = x(t - shift), on the same evaluation axis
+    """
+    return _node("shift", (shift,), (x,))
+
+
+def time_reverse(x):
+    """
+    y(t) = x(-t), on the same evaluation axis
+    """
+    return _node("reverse", (), (x,))
+
+
+# -----------------------------
+# EVALUATION
+# -----------------------------
+def evaluate(exprs, axis, chunk_size=DEFAULT_CHUNK, dtype=None, out=None):
+    """
+    Compute one expression (or a list of them) on the t / n array axis.
+
+    All expressions are evaluated together chunk by chunk, so every node
+    they share is computed once per chunk.
+
+    Inputs:
+    - exprs: an Expr or a list of Exprs
+    - axis: evaluation t or n array
+    - chunk_size: samples per chunk
+    - dtype: output dtype (None: dtype of the computed values, see dtypes.py)
+    - out: preallocated output array (a list of them for a list of exprs)
+
+    Returns an array, or a list of arrays for a list of expressions.
+    """
+    single = isinstance(exprs, Expr)
+    exprs = [exprs] if single else list(exprs)
+    outs = [out] if single else (list(out) if out is not None else [None] * len(exprs))
+    if len(outs) != len(exprs):
+        raise ValueError("Need one output array per expression.")
+
+    axis = np.asarray(axis)
+    N = len(axis)
+    chunk_size = max(int(chunk_size), 1)
+
+    for i in range(0, max(N, 1), chunk_size):
+        chunk = slice(i, min(i + chunk_size, N))
+        memo = {}
+        for k, expr in enumerate(exprs):
+            y = _eval(expr, axis[chunk], chunk, (1, 0), memo, dtype)
+            if outs[k] is None:
+                y_dtype = resolve_dtype(dtype, y) if dtype is not None else y.dtype
+                outs[k] = np.empty(np.shape(y)[:-1] + (N,), dtype=y_dtype)
+            outs[k][..., chunk] = y
+
+    return outs[0] if single else outs
+
+
+def _eval(node, t, chunk, transform, memo, dtype):
+    """
+    Value of node on the axis chunk t, seen through transform = (a, b):
+    the node is evaluated at a*t + b (a = ±1, from shifts and reversals).
+    """
+    key = (id(node), transform)
+    value = memo.get(key)
+    if value is not None:
+        return value
+
+    kind = node.kind
+    if kind == "generator":
+        func, params = node.params
+        value = func(_transformed_axis(t, transform, memo), **dict(params), dtype=dtype)
+    elif kind == "signal":
+        value = _eval_signal(node, t, chunk, transform, memo, dtype)
+    elif kind == "const":
+        value = np.full(len(t), node.params[0], dtype=resolve_dtype(dtype, t, node.params[0]))
+    elif kind == "scale":
+        value = _eval(node.children[0], t, chunk, transform, memo, dtype) * node.params[0]
+    elif kind in ("add", "multiply"):
+        x1, x2 = (_eval(c, t, chunk, transform, memo, dtype) for c in node.children)
+        value = x1 + x2 if kind == "add" else x1 * x2
+    elif kind == "shift":
+        # x(a*t + b - shift)
+        a, b = transform
+        value = _eval(node.children[0], t, chunk, (a, b - node.params[0]), memo, dtype)
+    elif kind == "reverse":
+        # x(-(a*t + b))
+        a, b = transform
+        value = _eval(node.children[0], t, chunk, (-a, -b), memo, dtype)
+    else:
+        raise ValueError(f"Unknown expression node {kind!r}.")
+
+    memo[key] = value
+    return value
+
+
+def _transformed_axis(t, transform, memo):
+    if transform == (1, 0):
+        return t
+    key = ("axis", transform)
+    axis = memo.get(key)
+    if axis is None:
+        a, b = transform
+        axis = a * t + b
+        memo[key] = axis
+    return axis
+
+
+def _eval_signal(node, t, chunk, transform, memo, dtype):
+    data, grid = node.params
+    # cast only the samples this chunk reads, never the whole array
+    out_dtype = data.dtype if dtype is None else np.dtype(dtype)
+
+    if grid is None:
+        if transform != (1, 0):
+            raise ValueError("Shifting or reversing sampled data needs its grid: use signal(x, axis).")
+        return data[..., chunk].astype(out_dtype, copy=False)
+
+    # sample index of every axis value on the data's grid
+    start, step = grid
+    pos = (_transformed_axis(t, transform, memo) - start) / step
+    idx = np.rint(pos).astype(np.intp)
+    if not np.allclose(pos, idx, rtol=0, atol=1e-6):
+        raise ValueError("Shifted / reversed samples fall between the grid points of the data.")
+
+    N = data.shape[-1]
+    inside = (idx >= 0) & (idx < N)
+    value = np.zeros(data.shape[:-1] + (len(t),), dtype=out_dtype)
+    value[..., inside] = data[..., idx[inside]]
+    return value
@@ -2,59 +2,80 @@
 
 import numpy as np
 
+from dtypes import resolve_dtype
+from instrument import instrumented
+
+#every generator takes dtype=None: float axes keep their precision, integer
+#axes give the default dtype (see dtypes.py). the values are computed in
+#that dtype, so float32 output does not go through a float64 temporary
+#(except the phase of the sines, see _sin_argument).
+
 
 #================================
 #continuos time signals (ct)
 #================================
 
 ## CT unit step function u(t) (ON/OFF signal)
-def unit_step_ct(t):
+@instrumented
+def unit_step_ct(t, dtype=None):
 
     """Generates a continuous time unit step signal u(t).
     u(t) = 0 for t < 0
     u(t) = 1 for t >= 0
     """
 #convert TRUE/FALSE to 1/0
-    u = (t >= 0).astype(float)
+    u = (t >= 0).astype(resolve_dtype(dtype, t))
     return u
 
 
 ##ramp signal r(t)
-def ramp_ct(t):
+@instrumented
+def ramp_ct(t, dtype=None):
     """CT ramp r(t)
     definition : r(t) = t * u(t)
     if t < 0, r(t) = 0
     if t >= 0, r(t) = t
     """
-    r = t * unit_step_ct(t)
+    # max(t, 0) is exactly t * u(t), without building u(t) first
+    r = np.maximum(t, 0, dtype=resolve_dtype(dtype, t))
     return r
 
 
 ##Continuos time sine wave signal(crucial building block for many signals)
-def sin_ct(t, f=1.0, A=1.0, phase=0.0):
+@instrumented
+def sin_ct(t, f=1.0, A=1.0, phase=0.0, dtype=None):
     """
     x(t) = A * sin(2πft + phase)
     f - frequency in Hz
     A - amplitude
     phase - in radians
     """
-    x = A * np.sin(2*np.pi*f*t + phase)
+    x = _sin_argument(f, t, np.empty(np.shape(t), dtype=resolve_dtype(dtype, t, A, phase)))
+    x += phase
+    np.sin(x, out=x)
+    x *= A
     return x
 
 
 ##continuos time exponential decay signal
-def exp_decay_ct(t, a=1.0):
+@instrumented
+def exp_decay_ct(t, a=1.0, dtype=None):
     """
     x(t) = e^(-at) * u(t)
     w/o u(t), x(t) would be exp growing for t < 0
     a - decay rate
     """
-    x = np.exp(-a*t) * unit_step_ct(t)
+    # only the t >= 0 part is evaluated, the rest stays 0
+    # (also avoids exp overflow to inf for large negative t)
+    x = np.zeros(np.shape(t), dtype=resolve_dtype(dtype, t))
+    causal = _causal_region(t)
+    x[causal] = np.exp(np.multiply(-a, t[causal], dtype=x.dtype))
     return x
 
 
 ##continuos time impulse funtion delta(t)/h(t)
-def impulse_like_ct(t, width=0.02):
+@instrumented
+def impulse_like_ct(t, width=0.02, dtype=None):
     """
     cant be exact impulse function cause that needs infinite height 
     at t = 0and thats not possible in numerical computing
@@ -65,7 +86,7 @@ def impulse_like_ct(t, width=0.02):
 
     ensured total area is approx 1
     """
-    x = np.zeros_like(t)
+    x = np.zeros(np.shape(t), dtype=resolve_dtype(dtype, t))
     region = np.abs(t) <= (width/2) 
     x[region] = 1.0 / width
     return x
@@ -78,19 +99,21 @@ def impulse_like_ct(t, width=0.02):
 #================================
 
 ## DT unit step function u[n]
-def unit_step_dt(n):
+@instrumented
+def unit_step_dt(n, dtype=None):
     """
     discrete time unit step signal u[n]
     definition:
     u[n] = 0 for n < 0
     u[n] = 1 for n >= 0
     """
-    u = (n >= 0).astype(float)
+    u = (n >= 0).astype(resolve_dtype(dtype, n))
     return u
 
 
 ## DT ramp signal r[n]
-def ramp_dt(n):
+@instrumented
+def ramp_dt(n, dtype=None):
     """
     discrete time ramp signal r[n]
     definition:
@@ -98,39 +121,187 @@ def ramp_dt(n):
     if n < 0, r[n] = 0
     if n >= 0, r[n] = n
     """
-    r = n * unit_step_dt(n)
+    r = np.maximum(n, 0, dtype=resolve_dtype(dtype, n))
     return r
 
 
 ## DT sine wave signal x[n]
-def sin_dt(n, f=0.1, A=1.0, phase=0.0):
+@instrumented
+def sin_dt(n, f=0.1, A=1.0, phase=0.0, dtype=None):
     """
     x[n] = A * sin(2πfn + phase)
     f - frequency in cycles/sample
     A - amplitude
     phase - in radians
     """
-    x = A * np.sin(2*np.pi*f*n + phase)
+    x = _sin_argument(f, n, np.empty(np.shape(n), dtype=resolve_dtype(dtype, n, A, phase)))
+    x += phase
+    np.sin(x, out=x)
+    x *= A
     return x
 
 
 ## Discrete time exponential decay signal
-def exp_decay_dt(n, a=0.9):
+@instrumented
+def exp_decay_dt(n, a=0.9, dtype=None):
     """
     definition:
     x[n] = a^n * u[n]
     a - decay rate (0 < a < 1 for decay)
     """
-    x = (a**n) * unit_step_dt(n)
+    # a^n only for n >= 0 (negative powers are never needed)
+    x = np.zeros(np.shape(n), dtype=resolve_dtype(dtype, n, a))
+    causal = _causal_region(n)
+    x[causal] = np.power(a, n[causal], dtype=x.dtype)
     return x
 
 
 ## Discrete time impulse function delta[n]
-def impulse_dt(n):
+@instrumented
+def impulse_dt(n, dtype=None):
     """
     definition:
     delta[n] = 1 for n = 0
     delta[n] = 0 otherwise
     """
-    d = (n==0).astype(float)
+    d = (n==0).astype(resolve_dtype(dtype, n))
     return d
+
+
+
+
+#================================
+#helpers
+#================================
+
+def _causal_region(t):
+    """
+    Index of the t >= 0 samples.
+
+    For an increasing axis (the usual linspace/arange) this is a slice found
+    by binary search, so x[region] is a view and nothing is allocated.
+    Otherwise it falls back to a boolean mask.
+    """
+    t = np.asarray(t)
+    if t.ndim == 1 and (len(t) < 2 or np.all(t[1:] >= t[:-1])):
+        return slice(int(np.searchsorted(t, 0, side="left")), None)
+    return t >= 0
+
+
+def _sin_argument(f, t, out):
+    """
+    Write 2πft into out and return it.
+
+    Below float64 the product f*t is formed in float64 and its whole cycles
+    dropped before the cast: sin only needs f*t mod 1, and a float32 f*n
+    of ~1e6 keeps too few digits after the point for a usable phase.
+    """
+    if np.finfo(out.dtype).bits >= 64:
+        return np.multiply(2*np.pi*f, t, out=out)
+    cycles = np.multiply(f, t, dtype=np.float64)
+    cycles -= np.floor(cycles)
+    out[...] = cycles
+    out *= 2*np.pi
+    return out
+
+
+def _param_columns(*params):
+    """
+    Broadcast scalar / 1-D parameters to a common length P and return them
+    as (P, 1) columns, ready to broadcast against a (N,) axis.
+    """
+    arrays = np.broadcast_arrays(*[np.atleast_1d(np.asarray(p, dtype=float)) for p in params])
+    if arrays[0].ndim != 1:
+        raise ValueError("Batch parameters must be scalars or 1-D arrays.")
+    return [a[:, None] for a in arrays]
+
+
+
+
+#================================
+#batched generators (parameter grids)
+#================================
+#each function takes 1-D arrays of parameters (scalars broadcast) and returns
+#a (params, samples) matrix, row i = the single-signal generator called with
+#parameter set i. every row is written in place into one output array.
+#power / exp / sin are evaluated directly, a recurrence like a^n = a * a^(n-1)
+#would add one rounding error per sample and is not exact.
+
+@instrumented
+def sin_ct_batch(t, f=1.0, A=1.0, phase=0.0, dtype=None):
+    """
+    rows: x_i(t) = A_i * sin(2π f_i t + phase_i)
+    """
+    return _sin_batch(t, f, A, phase, dtype)
+
+
+@instrumented
+def sin_dt_batch(n, f=0.1, A=1.0, phase=0.0, dtype=None):
+    """
+    rows: x_i[n] = A_i * sin(2π f_i n + phase_i), f in cycles/sample
+    """
+    return _sin_batch(n, f, A, phase, dtype)
+
+
+def _sin_batch(t, f, A, phase, dtype):
+    f, A, phase = _param_columns(f, A, phase)
+    x = np.empty((len(f), len(t)), dtype=resolve_dtype(dtype, t))
+    if np.finfo(x.dtype).bits >= 64:
+        np.multiply(2*np.pi*f, t, out=x)
+    else:
+        # row by row keeps the float64 phase temporary at one row
+        for row, f_row in zip(x, f):
+            _sin_argument(f_row, t, row)
+    x += phase
+    np.sin(x, out=x)
+    x *= A
+    return x
+
+
+@instrumented
+def exp_decay_ct_batch(t, a=1.0, dtype=None):
+    """
+    rows: x_i(t) = e^(-a_i t) u(t)
+    only the t >= 0 columns are computed.
+    """
+    (a,) = _param_columns(a)
+    x = np.zeros((len(a), len(t)), dtype=resolve_dtype(dtype, t))
+    causal = _causal_region(t)
+
+    if isinstance(causal, slice):
+        # exp written straight into the output, no temporaries
+        region = x[:, causal]
+        np.multiply(-a, t[causal], out=region)
+        np.exp(region, out=region)
+    else:
+        x[:, causal] = np.exp(np.multiply(-a, t[causal], dtype=x.dtype))
+    return x
+
+
+@instrumented
+def exp_decay_dt_batch(n, a=0.9, dtype=None):
+    """
+    rows: x_i[n] = a_i^n u[n]
+    only the n >= 0 columns are computed.
+    """
+    (a,) = _param_columns(a)
+    x = np.zeros((len(a), len(n)), dtype=resolve_dtype(dtype, n))
+    causal = _causal_region(n)
+
+    if isinstance(causal, slice):
+        np.power(a, n[causal], out=x[:, causal])
+    else:
+        x[:, causal] = np.power(a, n[causal], dtype=x.dtype)
+    return x
+
+
+@instrumented
+def impulse_like_ct_batch(t, width=0.02, dtype=None):
+    """
+    rows: rectangular pulses of height 1/width_i on |t| <= width_i/2
+    """
+    (width,) = _param_columns(width)
+    x = np.empty((len(width), len(t)), dtype=resolve_dtype(dtype, t))
+    inside = np.abs(t) <= (width / 2)
+    np.multiply(inside, 1.0 / width, out=x)
+    return x
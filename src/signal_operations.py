@@ -2,85 +2,315 @@
 
 #helps apply basic, standard operations on signals like shifting, scaling, time reversal
 #and addition/multiplication
+#
+#every operation takes dtype=None, the output dtype rule is in dtypes.py
+#(float inputs keep their precision, scalars never upcast).
 
 import numpy as np
 
+from dtypes import resolve_dtype
+from instrument import instrumented
+
+
+# -----------------------------
+# SIGNAL CONTAINER
+# -----------------------------
+class Signal:
+    """
+    A sampled signal whose time/index axis is a uniform grid.
+
+    Instead of a full t or n array the grid is stored as 3 numbers:
+        axis[i] = start + i * step,   i = 0 .. len(data) - 1
+    and data is kept as given (a view or np.memmap, never copied).
+
+    Because of that, shifting and time reversal only change start/step:
+        shift(s):   start -> start + s
+        reverse():  start -> -start, step -> -step
+    no samples are touched and nothing is allocated. The axis array is
+    only built when .axis is read.
+
+    Signals on a non-uniform axis are still supported (the explicit
+    axis array is kept instead), they just lose the O(1) operations.
+    """
+
+    __slots__ = ("data", "start", "step", "_axis")
+
+    def __init__(self, data, start=0, step=1):
+        self.data = np.asanyarray(data)
+        self.start = start
+        self.step = step
+        self._axis = None
+
+    @classmethod
+    def from_axis(cls, axis, data):
+        """
+        Build a Signal from an existing t or n array and its samples.
+        """
+        axis = np.asarray(axis)
+        data = np.asanyarray(data)
+        if axis.shape != data.shape[-1:]:
+            raise ValueError("Axis and signal must have the same length.")
+
+        N = len(axis)
+        if N == 0:
+            return cls(data)
+        if N == 1:
+            return cls(data, axis[0], axis.dtype.type(1))
+
+        if np.issubdtype(axis.dtype, np.integer):
+            step = axis[1] - axis[0]
+            uniform = np.all(np.diff(axis) == step)
+        else:
+            step = (axis[-1] - axis[0]) / (N - 1)
+            uniform = np.allclose(np.diff(axis), step, rtol=1e-9, atol=0)
+
+        if uniform and step != 0:
+            return cls(data, axis[0], step)
+
+        sig = cls(data, axis[0], step)
+        sig._axis = axis
+        return sig
+
+    @property
+    def uniform(self):
+        return self._axis is None
+
+    @property
+    def axis(self):
+        """
+        The t / n array, materialized on demand.
+        """
+        if self._axis is not None:
+            return self._axis
+        dtype = np.result_type(self.start, self.step)
+        return (self.start + self.step * np.arange(len(self))).astype(dtype, copy=False)
+
+    def __len__(self):
+        return self.data.shape[-1]
+
+    def __repr__(self):
+        return f"Signal(len={len(self)}, start={self.start}, step={self.step}, dtype={self.data.dtype})"
+
+    def shift(self, shift):
+        """
+        y(t) = x(t - shift): the same samples on a grid moved by shift.
+        """
+        sig = Signal(self.data, self.start + shift, self.step)
+        if self._axis is not None:
+            sig._axis = self._axis + shift
+        return sig
+
+    def reverse(self):
+        """
+        y(t) = x(-t): the same samples on a negated grid.
+
+        The grid then runs in decreasing time, use ascending() to flip it.
+        """
+        sig = Signal(self.data, -self.start, -self.step)
+        if self._axis is not None:
+            sig._axis = -self._axis
+        return sig
+
+    def ascending(self):
+        """
+        Same signal with the grid running forward in time.
+
+        For a reversed signal this is a reversed view of the data plus a new
+        start/step, still no copy.
+        """
+        if self._axis is not None or len(self) == 0 or self.step > 0:
+            return self
+        end = self.start + self.step * (len(self) - 1)
+        return Signal(self.data[..., ::-1], end, -self.step)
+
 
 #AMPLITUDE OPERATIONS
-def amplitude_scale(x, scale):
+#every operation below also takes out= (and the shift / reverse functions
+#t_out= / n_out= for the new axis): the result is written into that
+#preallocated array and returned, so a pipeline can reuse the same buffers.
+#out may be the input itself (in-place), reversal handles that aliasing.
+@instrumented
+def amplitude_scale(x, scale, dtype=None, out=None):
     """
     scale a signal amplitude
     operation: y[n] = scale * x[n] or y(t) = scale * x(t)
     """
-    y = scale * x
+    y = np.multiply(scale, x, out=out, dtype=_op_dtype(dtype, out, x, scale))
     return y
 
 
 # -----------------------------
 # CONTINUOUS-TIME (CT) OPERATIONS
 # -----------------------------
-def time_shift_ct(t,x,shift):
+@instrumented
+def time_shift_ct(t,x,shift,dtype=None,out=None,t_out=None):
     """
     if shift > 0, shifts signal to right
     if shift < 0, shifts signal to left
     operation: y(t) = x(t - shift)
+
+    returns a new time axis and a copy of x,
+    Signal.shift does the same without allocating anything
+    out / t_out - arrays to write the samples / the axis t + shift into
     """
-    t_shifted = t + shift
-    y = x.copy()
-    return t_shifted, y
+    return _shift(t, x, shift, dtype, out, t_out)
 
-def time_reverse_ct(t,x):
+@instrumented
+def time_reverse_ct(t,x,dtype=None,out=None,t_out=None,ascending=False):
     """
     reverses signal in time
     operation: y(t) = x(-t)
+
+    returns a new time axis and a copy of x,
+    Signal.reverse does the same without allocating anything
+    ascending - False: the axis is -t (decreasing), samples keep their order
+                True: the axis runs forward (-t reversed), samples reversed
+    out / t_out - arrays to write the samples / the axis into,
+                  out=x (t_out=t) reverses in place
     """
-    t_reversed = -t
-    y = x.copy()
-    return t_reversed, y
+    return _reverse(t, x, dtype, out, t_out, ascending)
 
 
 # -----------------------------
 # DISCRETE-TIME (DT) OPERATIONS
 # -----------------------------
-def shift_dt(n,x,shift):
+@instrumented
+def shift_dt(n,x,shift,dtype=None,out=None,n_out=None):
     """
     if shift > 0, shifts signal to right
     if shift < 0, shifts signal to left
     operation: y[n] = x[n - shift]
+
+    returns a new index axis and a copy of x,
+    Signal.shift does the same without allocating anything
+    out / n_out - arrays to write the samples / the axis n + shift into
     """
-    n_shifted = n + shift
-    y = x.copy()
-    return n_shifted, y
+    return _shift(n, x, shift, dtype, out, n_out)
 
-def reverse_dt(n,x):
+@instrumented
+def reverse_dt(n,x,dtype=None,out=None,n_out=None,ascending=False):
     """
     reverses signal in time
     operation: y[n] = x[-n]
+
+    returns a new index axis and a copy of x,
+    Signal.reverse does the same without allocating anything
+    ascending, out, n_out - as in time_reverse_ct
     """
-    n_reversed = -n
-    y = x.copy()
-    return n_reversed, y
+    return _reverse(n, x, dtype, out, n_out, ascending)
 
 
 # -----------------------------
 # SIGNAL COMBINATION OPERATIONS
 # -----------------------------
-def add_signals(x1, x2):
+@instrumented
+def add_signals(x1, x2, dtype=None, out=None):
     """
     adds two signals of same length
     operation: y = x1 + x2
     """
     if len(x1) != len(x2):
         raise ValueError("Signals must be of the same length to add.")
-    y = x1 + x2
+    y = np.add(x1, x2, out=out, dtype=_op_dtype(dtype, out, x1, x2))
     return y
 
-def multiply_signals(x1, x2):
+@instrumented
+def multiply_signals(x1, x2, dtype=None, out=None):
     """
     multiplies two signals of same length
     operation: y = x1 * x2
     """
     if len(x1) != len(x2):
         raise ValueError("Signals must be of the same length to multiply.")
-    y = x1 * x2
-    return y
\ No newline at end of file
+    y = np.multiply(x1, x2, out=out, dtype=_op_dtype(dtype, out, x1, x2))
+    return y
+
+
+# -----------------------------
+# HELPERS
+# -----------------------------
+#in-place reversal swaps the two halves through a buffer of this many samples
+_SWAP_CHUNK = 1 << 16
+
+
+def _op_dtype(dtype, out, *inputs):
+    """
+    Computation dtype of a ufunc call: with out= and no dtype, numpy
+    casts into out's dtype itself.
+    """
+    if out is not None and dtype is None:
+        return None
+    return resolve_dtype(dtype, *inputs)
+
+
+def _check_axis(axis, x):
+    if np.shape(axis) != np.shape(x)[-1:]:
+        raise ValueError("Axis and signal must have the same length.")
+
+
+def _copy_into(x, out, dtype):
+    """
+    Copy of x as a new array, or written into out (nothing to do if out is x).
+    """
+    if out is None:
+        return np.array(x, dtype=resolve_dtype(dtype, x))
+    if out is not x:
+        np.copyto(out, x, casting="same_kind")
+    return out
+
+
+def _same_view(a, b):
+    return (
+        a.shape == b.shape and a.strides == b.strides
+        and a.__array_interface__["data"][0] == b.__array_interface__["data"][0]
+    )
+
+
+def _reverse_into(x, out, dtype=None):
+    """
+    x[..., ::-1] as a new array, or written into out.
+
+    out may overlap x: the same array is reversed in place by swapping
+    chunks from both ends (one _SWAP_CHUNK buffer), any other overlap
+    reads from a copy of x first.
+    """
+    x = np.asanyarray(x)
+    if out is None:
+        return np.array(x[..., ::-1], dtype=resolve_dtype(dtype, x))
+
+    if np.shares_memory(out, x):
+        if _same_view(out, x):
+            _reverse_in_place(out)
+            return out
+        x = x.copy()
+    np.copyto(out, x[..., ::-1], casting="same_kind")
+    return out
+
+
+def _reverse_in_place(x):
+    N = x.shape[-1]
+    half = N // 2
+    for i in range(0, half, _SWAP_CHUNK):
+        j = min(i + _SWAP_CHUNK, half)
+        # x[i:j] <-> x[N-j:N-i] reversed; the two ranges never overlap
+        front = x[..., i:j].copy()
+        x[..., i:j] = x[..., N - j:N - i][..., ::-1]
+        x[..., N - j:N - i] = front[..., ::-1]
+
+
+def _shift(axis, x, shift, dtype, out, axis_out):
+    _check_axis(axis, x)
+    return np.add(axis, shift, out=axis_out), _copy_into(x, out, dtype)
+
+
+def _reverse(axis, x, dtype, out, axis_out, ascending):
+    if not ascending:
+        _check_axis(axis, x)
+        return np.negative(axis, out=axis_out), _copy_into(x, out, dtype)
+
+    # forward-running axis: -axis reversed, samples reversed
+    _check_axis(axis, x)
+    axis = np.asarray(axis)
+    new_axis = _reverse_into(axis, np.empty_like(axis) if axis_out is None else axis_out)
+    np.negative(new_axis, out=new_axis)
+    return new_axis, _reverse_into(x, out, dtype)
@@ -0,0 +1,236 @@
+###SIGNAL STORAGE MODULE
+
+#saves signals to disk as memory-mapped .npy files so they can be larger than RAM.
+#every signal is 2 files:
+#   name.npy   the samples (standard numpy format, opened with mmap)
+#   name.json  the grid metadata: start, step, length, dtype
+#
+#the helpers at the bottom run signal_operations / convolution functions
+#chunk by chunk over memmapped signals and write straight into a memmapped
+#output, so only one chunk is in memory at a time.
+
+import json
+import os
+
+import numpy as np
+
+from signal_operations import Signal
+from convolution import StreamingConvolver
+
+
+#samples processed per step by the chunked helpers
+DEFAULT_CHUNK = 1 << 20
+
+
+# -----------------------------
+# SAVE / LOAD
+# -----------------------------
+def _paths(path):
+    """
+    'name', 'name.npy' or 'name.json' -> ('name.npy', 'name.json')
+    """
+    base, ext = os.path.splitext(path)
+    if ext not in (".npy", ".json"):
+        base = path
+    return base + ".npy", base + ".json"
+
+
+def _write_meta(path, start, step, length, dtype):
+    _, meta_path = _paths(path)
+    meta = {
+        "start": np.asarray(start).item(),
+        "step": np.asarray(step).item(),
+        "length": int(length),
+        "dtype": np.dtype(dtype).str,
+    }
+    with open(meta_path, "w") as f:
+        json.dump(meta, f, indent=2)
+
+
+def save_signal(path, sig):
+    """
+    Save a Signal (samples + grid) to path.npy / path.json.
+
+    Only uniform-grid signals can be stored, the axis is never written.
+    """
+    if not sig.uniform:
+        raise ValueError("Only signals on a uniform grid can be saved.")
+
+    data_path, _ = _paths(path)
+    out = np.lib.format.open_memmap(data_path, mode="w+", dtype=sig.data.dtype, shape=sig.data.shape)
+    for i, chunk in iter_chunks(sig):
+        out[..., i:i + chunk.shape[-1]] = chunk
+    out.flush()
+    del out
+
+    _write_meta(path, sig.start, sig.step, len(sig), sig.data.dtype)
+
+
+def create_signal(path, length, start=0, step=1, dtype=np.float64):
+    """
+    Create an empty (zero-filled) signal on disk and return it as a
+    writable memmap-backed Signal.
+    """
+    data_path, _ = _paths(path)
+    data = np.lib.format.open_memmap(data_path, mode="w+", dtype=dtype, shape=(int(length),))
+    _write_meta(path, start, step, length, dtype)
+    return Signal(data, start, step)
+
+
+def load_signal(path, mode="r"):
+    """
+    Open a saved signal without reading it: the data is a np.memmap.
+
+    mode - "r" read-only, "r+" read/write, "c" copy-on-write
+    """
+    data_path, meta_path = _paths(path)
+    with open(meta_path) as f:
+        meta = json.load(f)
+
+    data = np.load(data_path, mmap_mode=mode)
+    if data.shape[-1] != meta["length"]:
+        raise ValueError(f"{data_path} has {data.shape[-1]} samples, metadata says {meta['length']}.")
+    return Signal(data, meta["start"], meta["step"])
+
+
+def update_grid(path, start=None, step=None):
+    """
+    Rewrite only the grid metadata of a saved signal.
+
+    Shifting or reversing a stored signal (see Signal.shift / Signal.reverse)
+    changes nothing but start/step, so it never touches the samples on disk.
+    """
+    sig = load_signal(path)
+    _write_meta(
+        path,
+        sig.start if start is None else start,
+        sig.step if step is None else step,
+        len(sig),
+        sig.data.dtype,
+    )
+
+
+# -----------------------------
+# CHUNKED PROCESSING
+# -----------------------------
+def iter_chunks(sig, chunk_size=DEFAULT_CHUNK):
+    """
+    Yield (first sample index, chunk) pairs covering sig.data.
+
+    Chunks are views into the memmap, only the pages touched are read.
+    """
+    N = len(sig)
+    for i in range(0, N, chunk_size):
+        yield i, sig.data[..., i:i + chunk_size]
+
+
+def map_chunks(func, signals, out_path, chunk_size=DEFAULT_CHUNK, dtype=None):
+    """
+    Apply an elementwise operation chunk by chunk and write the result to disk.
+
+    Inputs:
+    - func: called with one chunk per input signal, returns the output chunk
+      e.g. lambda a: amplitude_scale(a, 2) or add_signals
+    - signals: list of Signals on the same uniform grid (memmapped or not)
+    - out_path: where the result is stored
+    - dtype: output dtype (default: dtype of the first output chunk)
+
+    Inputs are taken on their ascending grid (see Signal.ascending), the
+    output is on that shared grid.
+    """
+    signals = [sig.ascending() for sig in signals]
+    N = len(signals[0])
+    if any(len(sig) != N for sig in signals):
+        raise ValueError("Signals must be of the same length.")
+    for sig in signals:
+        _check_uniform(sig)
+        if N > 1 and not (np.isclose(sig.start, signals[0].start, rtol=1e-9, atol=0)
+                          and np.isclose(sig.step, signals[0].step, rtol=1e-9, atol=0)):
+            raise ValueError("Signals must share the same grid (start and step).")
+
+    out = None
+    for i in range(0, N, chunk_size):
+        chunks = [sig.data[..., i:i + chunk_size] for sig in signals]
+        y = np.asarray(func(*chunks))
+        if out is None:
+            first = signals[0]
+            out = create_signal(out_path, N, first.start, first.step, dtype or y.dtype)
+        out.data[i:i + len(y)] = y
+
+    if out is None:
+        first = signals[0]
+        out = create_signal(out_path, 0, first.start, first.step, dtype or first.data.dtype)
+    out.data.flush()
+    return out
+
+
+def _check_uniform(sig):
+    if not sig.uniform:
+        raise ValueError("Signals on disk need a uniform grid (start + i * step).")
+
+
+def reverse_to(sig, out_path, chunk_size=DEFAULT_CHUNK):
+    """
+    Time reversal y(t) = x(-t) written to disk with the grid running forward.
+
+    (sig.reverse() is free but keeps a decreasing grid; this rewrites the
+    samples in increasing-time order, one chunk at a time.)
+    """
+    # on an ascending grid the samples are stored in increasing time,
+    # so reversing them gives x(-t) in increasing time as well
+    sig = sig.ascending()
+    _check_uniform(sig)
+    rev = sig.reverse().ascending()
+    out = create_signal(out_path, len(rev), rev.start, rev.step, sig.data.dtype)
+
+    N = len(sig)
+    for i in range(0, N, chunk_size):
+        # output chunk [i, i + n) comes from input chunk [N - i - n, N - i) reversed
+        n = min(chunk_size, N - i)
+        out.data[i:i + n] = sig.data[N - i - n:N - i][::-1]
+
+    out.data.flush()
+    return out
+
+
+def convolve_to(sig, h, out_path, ct=False, chunk_size=DEFAULT_CHUNK):
+    """
+    Convolve a (memmapped) signal with h and write the full N + M - 1
+    output to disk, using StreamingConvolver so memory stays at one chunk.
+
+    Inputs:
+    - sig: input Signal
+    - h: impulse response, a Signal on the same step as sig (its start sets
+      the output grid) or a plain array starting at index/time 0
+    - out_path: where the result is stored
+    - ct: True for CT convolution, the output is scaled by dt = sig.step
+      like conv_ct_manual
+
+    Output grid follows conv_output_index_dt: start = start of x + start of h.
+    Reversed signals (negative step) are convolved on their ascending grid.
+    """
+    sig = sig.ascending()
+    if not isinstance(h, Signal):
+        h = Signal(h, 0, sig.step)
+    h = h.ascending()
+    _check_uniform(sig)
+    _check_uniform(h)
+    if len(sig) > 1 and len(h) > 1 and not np.isclose(h.step, sig.step, rtol=1e-9, atol=0):
+        raise ValueError(f"Kernel step {h.step} does not match the signal step {sig.step}.")
+    step = sig.step if len(sig) > 1 else h.step
+    h_data = np.asarray(h.data)
+
+    conv = StreamingConvolver(h_data)
+    N = len(sig)
+    M = len(h_data)
+    dtype = np.result_type(sig.data.dtype, h_data.dtype, 1.0)
+
+    out = create_signal(out_path, N + M - 1, sig.start + h.start, step, dtype)
+    scale = step if ct else 1
+
+    for i, chunk in iter_chunks(sig, chunk_size):
+        out.data[i:i + len(chunk)] = conv.process(chunk) * scale
+
+    out.data[N:] = conv.flush() * scale
+    out.data.flush()
+    return out
@@ -0,0 +1,334 @@
+###SPECTRAL ANALYSIS
+#frequency-domain views of the signals and kernels of this toolkit:
+#   spectrum / magnitude_phase   FFT of a CT or DT signal on its t / n axis
+#   frequency_response           H(f) of a kernel, e.g. impulse_like_ct or exp_decay_dt
+#   WelchPSD / welch             power spectral density, a stream can be fed chunk by chunk
+#
+#frequencies are in 1/axis units: Hz for t in seconds, cycles/sample for n.
+#spectra are scaled by dt and referenced to the axis start, so for CT they
+#approximate X(f) = ∫ x(t) e^{-j2πft} dt and for DT they are the DTFT
+#X(f) = Σ x[n] e^{-j2πfn} at the FFT bins.
+#
+#the setup of a transform (FFT size, window, its sums, the frequency axis) is a
+#SpectralPlan, built once per (length, nfft, window, dt) and kept in a small LRU,
+#so analysing many frames of the same length does no setup after the first one.
+
+from collections import OrderedDict
+
+import numpy as np
+
+from convolution import _next_fast_len
+from instrument import instrumented
+from signal_operations import Signal
+
+
+WINDOWS = ("boxcar", "hann", "hamming", "blackman")
+
+#frequency_response evaluates H(f) on at least this many FFT points
+DEFAULT_RESPONSE_POINTS = 4096
+
+#plans kept in the LRU
+PLAN_CACHE_SIZE = 64
+
+
+# -----------------------------
+# PLANS
+# -----------------------------
+class SpectralPlan:
+    """
+    Everything an FFT of n-sample frames needs besides the data.
+
+    - nfft: transform size (frames are zero-padded to it)
+    - window: the n window samples (read-only), None for no window
+    - window_sum / window_power: sum(w) and sum(w^2), for amplitude / PSD scaling
+    - freqs: frequency of every output bin (read-only)
+    - onesided: True for real input (rfft bins 0 .. nfft/2), False for
+      complex input (all bins, fftshift order: negative frequencies first)
+    """
+
+    __slots__ = ("n", "nfft", "dt", "onesided", "window", "window_sum", "window_power", "freqs")
+
+    def __init__(self, n, nfft, window=None, dt=1.0, onesided=True):
+        if n < 1 or nfft < n:
+            raise ValueError("Need 1 <= n <= nfft.")
+        self.n = n
+        self.nfft = nfft
+        self.dt = dt
+        self.onesided = onesided
+
+        w = _window(window, n)
+        if w is not None:
+            w.flags.writeable = False
+        self.window = w
+        self.window_sum = float(n if w is None else w.sum())
+        self.window_power = float(n if w is None else np.dot(w, w))
+
+        if onesided:
+            freqs = np.fft.rfftfreq(nfft, dt)
+        else:
+            freqs = np.fft.fftshift(np.fft.fftfreq(nfft, dt))
+        freqs.flags.writeable = False
+        self.freqs = freqs
+
+    def transform(self, x):
+        """
+        FFT of the frames x (..., n) after windowing, unscaled.
+        """
+        if self.window is not None:
+            x = x * self.window
+        if self.onesided:
+            return np.fft.rfft(x, self.nfft, axis=-1)
+        return np.fft.fftshift(np.fft.fft(x, self.nfft, axis=-1), axes=-1)
+
+
+_PLANS = OrderedDict()
+_PLAN_STATS = {"hits": 0, "misses": 0}
+
+
+def get_plan(n, nfft=None, window=None, dt=1.0, onesided=True):
+    """
+    The cached SpectralPlan for these settings (built on first use).
+
+    nfft None: the next FFT-friendly length >= n. A window given as an
+    array is not cached (arrays cannot be keys).
+    """
+    nfft = _next_fast_len(n) if nfft is None else int(nfft)
+    if isinstance(window, np.ndarray):
+        return SpectralPlan(n, nfft, window, dt, onesided)
+
+    key = (n, nfft, window, float(dt), onesided)
+    plan = _PLANS.get(key)
+    if plan is not None:
+        _PLANS.move_to_end(key)
+        _PLAN_STATS["hits"] += 1
+        return plan
+
+    _PLAN_STATS["misses"] += 1
+    plan = SpectralPlan(n, nfft, window, dt, onesided)
+    _PLANS[key] = plan
+    if len(_PLANS) > PLAN_CACHE_SIZE:
+        _PLANS.popitem(last=False)
+    return plan
+
+
+def plan_cache_info():
+    return {**_PLAN_STATS, "entries": len(_PLANS), "max_entries": PLAN_CACHE_SIZE}
+
+
+def clear_plan_cache():
+    _PLANS.clear()
+    _PLAN_STATS.update(hits=0, misses=0)
+
+
+# -----------------------------
+# SPECTRA
+# -----------------------------
+@instrumented
+def spectrum(axis, x, nfft=None, window=None):
+    """
+    Spectrum X(f) of a signal sampled on a uniform t / n axis.
+
+    Inputs:
+    - axis: t or n array (uniform)
+    - x: samples, (..., len(axis)) for several signals on the same axis
+    - nfft: FFT size (None = next fast length >= len(axis), more zero-pads
+      for a finer frequency grid)
+    - window: None, a name in WINDOWS or an array of len(axis) samples
+
+    Returns (freqs, X). Real x gives f >= 0 only, complex x all
+    frequencies from -fs/2 upwards.
+    """
+    return _spectrum(axis, x, nfft, window)
+
+
+def _spectrum(axis, x, nfft, window):
+    # spectrum without the instrumentation, for the functions built on it
+    start, dt = _grid(axis, x)
+    x = np.asarray(x)
+    plan = get_plan(x.shape[-1], nfft, window, dt, onesided=not np.iscomplexobj(x))
+
+    X = plan.transform(x)
+    X *= dt
+    if start != 0:
+        # the FFT puts the first sample at 0: move it back to axis[0]
+        X *= np.exp(-2j * np.pi * plan.freqs * start)
+    return plan.freqs, X
+
+
+@instrumented
+def magnitude_phase(axis, x, nfft=None, window=None, unwrap=False):
+    """
+    |X(f)| and angle X(f) in radians (see spectrum).
+
+    unwrap - remove the 2π jumps of the phase along f
+    """
+    freqs, X = _spectrum(axis, x, nfft, window)
+    phase = np.angle(X)
+    if unwrap:
+        phase = np.unwrap(phase, axis=-1)
+    return freqs, np.abs(X), phase
+
+
+@instrumented
+def frequency_response(axis, h, nfft=None):
+    """
+    Frequency response H(f) of the kernel h sampled on axis.
+
+    For a CT kernel this is the dt-scaled spectrum, so conv_ct_manual(t, x, h)
+    multiplies the spectrum of x by exactly this H(f) (e.g. H(0) ≈ 1 for
+    impulse_like_ct). nfft defaults to at least DEFAULT_RESPONSE_POINTS
+    for a smooth curve.
+    """
+    if nfft is None:
+        nfft = _next_fast_len(max(np.shape(h)[-1], DEFAULT_RESPONSE_POINTS))
+    return _spectrum(axis, h, nfft, None)
+
+
+# -----------------------------
+# WELCH PSD
+# -----------------------------
+class WelchPSD:
+    """
+    Welch power spectral density of a real signal that arrives in chunks.
+
+    The stream is cut into segments of nperseg samples (consecutive
+    segments share noverlap of them), every segment is windowed and its
+    periodogram added to a running sum. Memory stays at one segment of
+    leftover samples plus one spectrum, however long the stream is.
+
+    Inputs:
+    - nperseg: samples per segment
+    - noverlap: samples shared by consecutive segments (None = nperseg // 2)
+    - window: a name in WINDOWS or an array of nperseg samples
+    - dt: sample spacing (t[1] - t[0] for CT, 1 for DT)
+    - nfft: FFT size per segment (None = nperseg, larger zero-pads)
+    - detrend: "constant" removes the mean of every segment, None keeps it
+
+    result() returns the one-sided density (power per unit frequency, so
+    summing it times df gives the signal power).
+
+    Example:
+        psd = WelchPSD(nperseg=256, dt=t[1] - t[0])
+        for chunk in chunks:
+            psd.update(chunk)
+        f, Pxx = psd.result()
+    """
+
+    def __init__(self, nperseg=256, noverlap=None, window="hann", dt=1.0, nfft=None, detrend="constant"):
+        nperseg = int(nperseg)
+        noverlap = nperseg // 2 if noverlap is None else int(noverlap)
+        if nperseg < 1:
+            raise ValueError("nperseg must be a positive integer.")
+        if not 0 <= noverlap < nperseg:
+            raise ValueError("noverlap must be in [0, nperseg).")
+        if detrend not in ("constant", None):
+            raise ValueError('detrend must be "constant" or None.')
+
+        self.nperseg = nperseg
+        self.noverlap = noverlap
+        self.hop = nperseg - noverlap
+        self.detrend = detrend
+        self.plan = get_plan(nperseg, nperseg if nfft is None else nfft, window, dt)
+        self.reset()
+
+    def reset(self):
+        """
+        Drop everything seen so far.
+        """
+        self._leftover = np.empty(0)
+        self._power = np.zeros(len(self.plan.freqs))
+        self.n_segments = 0
+        self.samples_in = 0
+
+    @instrumented(name="WelchPSD.update")
+    def update(self, chunk):
+        """
+        Feed the next samples (1-D, real). Returns self.
+        """
+        return self._update(chunk)
+
+    def _update(self, chunk):
+        chunk = np.asarray(chunk)
+        if chunk.ndim != 1:
+            raise ValueError("WelchPSD chunks must be 1-D arrays.")
+        if np.iscomplexobj(chunk):
+            raise ValueError("WelchPSD only handles real signals.")
+        self.samples_in += len(chunk)
+
+        data = np.concatenate((self._leftover, chunk)) if len(self._leftover) else chunk
+        n_seg = (len(data) - self.nperseg) // self.hop + 1 if len(data) >= self.nperseg else 0
+
+        if n_seg:
+            segments = np.lib.stride_tricks.sliding_window_view(data, self.nperseg)[::self.hop][:n_seg]
+            if self.detrend == "constant":
+                segments = segments - segments.mean(axis=-1, keepdims=True)
+            X = self.plan.transform(segments)
+            self._power += (X.real**2 + X.imag**2).sum(axis=0)
+            self.n_segments += n_seg
+
+        # samples from the next segment start on (fewer than nperseg)
+        self._leftover = np.array(data[n_seg * self.hop:], dtype=np.float64)
+        return self
+
+    def result(self):
+        """
+        (freqs, psd) averaged over every complete segment so far.
+        """
+        if self.n_segments == 0:
+            raise ValueError(f"Need at least nperseg = {self.nperseg} samples for a PSD estimate.")
+
+        plan = self.plan
+        psd = self._power * (plan.dt / (self.n_segments * plan.window_power))
+        # one-sided: fold the negative frequencies onto the positive ones
+        # (DC and, for even nfft, the Nyquist bin have no mirror)
+        if plan.nfft % 2:
+            psd[1:] *= 2
+        else:
+            psd[1:-1] *= 2
+        return plan.freqs, psd
+
+
+@instrumented
+def welch(axis, x, nperseg=256, noverlap=None, window="hann", nfft=None, detrend="constant"):
+    """
+    Welch PSD of a whole signal on its t / n axis (see WelchPSD).
+    """
+    _, dt = _grid(axis, x)
+    nperseg = min(int(nperseg), np.shape(x)[-1])
+    psd = WelchPSD(nperseg, noverlap, window, dt, nfft, detrend)
+    return psd._update(x).result()
+
+
+# -----------------------------
+# HELPERS
+# -----------------------------
+def _window(window, n):
+    if window is None:
+        return None
+    if isinstance(window, np.ndarray):
+        if window.shape != (n,):
+            raise ValueError(f"Window must have {n} samples.")
+        return np.array(window, dtype=np.float64)
+    if window == "boxcar":
+        return np.ones(n)
+    # periodic windows (the n + 1 point symmetric window without its last sample),
+    # the usual choice for spectral analysis
+    if window == "hann":
+        return np.hanning(n + 1)[:-1]
+    if window == "hamming":
+        return np.hamming(n + 1)[:-1]
+    if window == "blackman":
+        return np.blackman(n + 1)[:-1]
+    raise ValueError(f"Unknown window {window!r}, expected one of {WINDOWS} or an array.")
+
+
+def _grid(axis, x):
+    """
+    (start, step) of the uniform t / n axis of x.
+    """
+    sig = Signal.from_axis(axis, np.asarray(x))
+    if not sig.uniform:
+        raise ValueError("Spectral analysis needs a uniform t / n axis.")
+    if len(sig) < 2:
+        return float(sig.start) if len(sig) else 0.0, 1.0
+    return float(sig.start), float(sig.step)